@@ -0,0 +1,122 @@
+"""Maintenance commands.
+
+    python -m app.cli migrate
+    python -m app.cli reindex [--chunk-size N] [--chunk-overlap N]
+
+reindex re-parses and re-splits every uploaded file, reusing cached
+embeddings for chunks whose text is unchanged. The chunking it uses is
+saved with the index and the server keeps splitting new uploads that way.
+It drops and rebuilds the collection and keyword index, so it refuses to
+run while a server using the same CHROMA_PERSIST_DIR is up; stop the
+server first.
+"""
+from sqlalchemy import select
+from app.config import settings
+from app.database import async_session, init_db
+from app.models import Document
+from app.services.rag_service import rag_service
+from app.utils import locks
+from app.utils.document_processor import iter_document_text, shutdown_process_pool
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+async def _iter_segments(file_path: str, file_type: str):
+    for segment in iter_document_text(file_path, file_type):
+        yield segment
+
+async def migrate():
+    """Bring an existing database up to the current schema, adding new columns and indexes"""
+    started = time.perf_counter()
+    await init_db()
+    print(f"Database schema is up to date ({time.perf_counter() - started:.1f}s)")
+
+async def reindex(chunk_size: int = None, chunk_overlap: int = None):
+    """Re-split uploaded files into a new vector index, embedding only chunks missing from the cache"""
+    await init_db()
+    # Warmup loads the chunking of the old index, which this run replaces
+    await rag_service.warmup()
+    rag_service.set_chunking(
+        chunk_size or settings.chunk_size,
+        chunk_overlap if chunk_overlap is not None else settings.chunk_overlap
+    )
+    await rag_service.reset()
+    rag_service.save_chunking()
+    cached_before = len(rag_service.embedding_store)
+    started = time.perf_counter()
+
+    async with async_session() as db:
+        result = await db.execute(
+            select(Document)
+            .where(Document.processed == True)
+            .order_by(Document.uploaded_at)
+        )
+        documents = result.scalars().all()
+        missing = 0
+
+        for document in documents:
+            if not os.path.exists(document.file_path):
+                # Its vectors are gone with the reset, so it must not stay listed as searchable
+                print(f"Skipping {document.filename}: file missing at {document.file_path}")
+                document.processed = False
+                document.status = "failed"
+                document.error = "File missing when the index was rebuilt"
+                document.chunk_count = 0
+                document.chunks_embedded = 0
+                missing += 1
+                continue
+
+            document.chunk_count = await rag_service.add_document_stream(
+                _iter_segments(document.file_path, document.file_type),
+                metadata={
+                    "document_id": document.id,
+                    "filename": document.filename,
+                    "file_type": document.file_type
+                }
+            )
+            document.chunks_embedded = document.chunk_count
+            print(f"Indexed {document.filename}: {document.chunk_count} chunks")
+
+        await db.commit()
+
+    print(
+        f"Reindexed {len(documents) - missing} documents in {time.perf_counter() - started:.1f}s "
+        f"with chunk_size={rag_service.chunk_size}, chunk_overlap={rag_service.chunk_overlap}, "
+        f"{len(rag_service.embedding_store) - cached_before} new embeddings computed"
+    )
+    if missing:
+        print(f"Marked {missing} documents with missing files as failed")
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("migrate", help="Add new columns and indexes to an existing database")
+
+    reindex_parser = commands.add_parser(
+        "reindex",
+        help="Re-parse and re-split uploaded files into a new vector index, reusing cached embeddings"
+    )
+    reindex_parser.add_argument("--chunk-size", type=int, help="chunk size to rebuild with and keep using (default CHUNK_SIZE)")
+    reindex_parser.add_argument("--chunk-overlap", type=int, help="chunk overlap to rebuild with and keep using (default CHUNK_OVERLAP)")
+
+    args = parser.parse_args()
+    try:
+        if args.command == "migrate":
+            asyncio.run(migrate())
+        elif args.command == "reindex":
+            try:
+                server_lock = locks.acquire(locks.server_lock_path(), blocking=False)
+            except locks.LockHeld:
+                sys.exit("The server is running on this index; stop it before reindexing")
+            try:
+                asyncio.run(reindex(args.chunk_size, args.chunk_overlap))
+            finally:
+                locks.release(server_lock)
+    finally:
+        shutdown_process_pool()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -1,8 +1,75 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy import event, inspect, literal, make_url, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.config import settings
+from app.utils.metrics import DB_QUERY_SECONDS
+import time
 
-engine = create_async_engine(settings.database_url, echo=True)
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers proceed while a chat stream writes; busy_timeout makes
+    # concurrent writers queue for the lock instead of failing with "database is locked"
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    cursor.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+# Statement kinds given their own label in the query latency histogram
+_QUERY_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE"}
+
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    keyword = statement.split(None, 1)[0].upper() if statement.strip() else ""
+    DB_QUERY_SECONDS.observe(
+        time.perf_counter() - context._query_started,
+        operation=keyword.lower() if keyword in _QUERY_OPERATIONS else "other"
+    )
+
+def _instrument(engine: AsyncEngine) -> AsyncEngine:
+    event.listen(engine.sync_engine, "before_cursor_execute", _query_started)
+    event.listen(engine.sync_engine, "after_cursor_execute", _query_finished)
+    return engine
+
+def create_engine(database_url: str = None, echo: bool = None) -> AsyncEngine:
+    """Async engine with pooling and connection setup suited to the configured database"""
+    url = make_url(database_url or settings.database_url)
+    echo = settings.database_echo if echo is None else echo
+
+    if url.get_backend_name() == "sqlite":
+        if not url.database or url.database == ":memory:":
+            return _instrument(create_async_engine(url, echo=echo))
+
+        # aiosqlite defaults to NullPool, opening a connection and thread per session
+        engine = create_async_engine(
+            url,
+            echo=echo,
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=settings.database_pool_size,
+            max_overflow=settings.database_max_overflow,
+            pool_timeout=settings.database_pool_timeout,
+            connect_args={"timeout": settings.sqlite_busy_timeout_ms / 1000}
+        )
+        event.listen(engine.sync_engine, "connect", _apply_sqlite_pragmas)
+        return _instrument(engine)
+
+    if url.drivername == "postgresql":
+        url = url.set(drivername="postgresql+asyncpg")
+    return _instrument(create_async_engine(
+        url,
+        echo=echo,
+        pool_size=settings.database_pool_size,
+        max_overflow=settings.database_max_overflow,
+        pool_timeout=settings.database_pool_timeout,
+        pool_recycle=settings.database_pool_recycle,
+        pool_pre_ping=True
+    ))
+
+engine = create_engine()
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 Base = declarative_base()
 
@@ -13,6 +80,33 @@ async def get_db():
         finally:
             await session.close()
 
+def _upgrade_schema(conn):
+    """Add columns and indexes introduced after a table was first created"""
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=conn.dialect)}"
+            if column.default is not None and column.default.is_scalar:
+                default = literal(column.default.arg, type_=column.type)
+                ddl += f" DEFAULT {default.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True})}"
+            conn.execute(text(ddl))
+
+        for index in table.indexes:
+            try:
+                # A savepoint, so a unique index existing rows violate doesn't abort the whole upgrade
+                with conn.begin_nested():
+                    index.create(conn, checkfirst=True)
+            except IntegrityError as e:
+                print(f"Skipped index {index.name}: existing rows violate it, resolve them and restart ({e.orig})")
+
 async def init_db():
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
\ No newline at end of file
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_upgrade_schema)
\ No newline at end of file
@@ -1,16 +1,97 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
-from app.database import init_db
+from typing import Awaitable, Dict
+import asyncio
+import time
+from app.config import settings
+from app.database import engine, init_db
 from app.routers import threads, chat, documents
+from app.services.ingestion_service import ingestion_service
+from app.services.llm_service import llm_service
+from app.services.message_writer import message_writer
+from app.services.rag_service import rag_service, WARMUP_RETRY_DELAY, WARMUP_RETRY_MAX_DELAY
+from app.services.answer_cache import answer_cache
+from app.services.search_service import search_service
+from app.utils import background, locks, metrics
+from app.utils.document_processor import shutdown_process_pool
+from app.utils.pagination import NEXT_CURSOR_HEADER
+from app.utils.executors import embedding_executor, rerank_executor, vectorstore_executor
+from app.utils.uploads import UploadLimitMiddleware
+
+def _cache_counts(field: str) -> Dict[tuple, float]:
+    stats = {
+        "query_embedding": rag_service.embedding_cache.stats(),
+        "retrieval": rag_service.result_cache.stats(),
+        "web_search": search_service.cache.stats(),
+        "answer": answer_cache.stats()
+    }
+    return {(cache,): values[field] for cache, values in stats.items()}
+
+metrics.Counter("fyora_cache_hits_total", "Cache hits", ["cache"], collect=lambda: _cache_counts("hits"))
+metrics.Counter("fyora_cache_misses_total", "Cache misses", ["cache"], collect=lambda: _cache_counts("misses"))
+metrics.Gauge("fyora_cache_entries", "Entries held in each cache", ["cache"], collect=lambda: _cache_counts("size"))
+metrics.Counter(
+    "fyora_message_write_batches_total",
+    "Batched message write transactions",
+    collect=lambda: {(): message_writer.batches}
+)
+metrics.Counter(
+    "fyora_message_writes_total",
+    "Message inserts and updates written",
+    collect=lambda: {(): message_writer.writes}
+)
+
+async def _timed(timings: Dict[str, float], name: str, step: Awaitable):
+    started = time.perf_counter()
+    await step
+    timings[f"{name}_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+async def _warmup(app: FastAPI):
+    """Load models and open stores after startup, so the server accepts connections immediately"""
+    timings = app.state.startup_timings
+    # Same schedule as rag_service's own backoff, so a retry never lands inside it
+    delay = WARMUP_RETRY_DELAY
+    while True:
+        try:
+            await _timed(timings, "rag", rag_service.warmup())
+            timings.update(rag_service.startup_timings)
+            await _timed(timings, "tokenizer", llm_service.warmup())
+            await _timed(timings, "keyword_index_sync", rag_service.sync_keyword_index())
+            app.state.warmup_error = None
+            app.state.ready = True
+            print(f"Warmup complete: {timings}")
+            return
+        except Exception as e:
+            app.state.warmup_error = str(e) or type(e).__name__
+            print(f"Warmup error: {app.state.warmup_error}, retrying in {delay:g}s")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, WARMUP_RETRY_MAX_DELAY)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    await init_db()
+    app.state.ready = False
+    app.state.warmup_error = None
+    app.state.startup_timings = {}
+    # Shared, so several workers can run while `python -m app.cli reindex` is kept out
+    server_lock = locks.acquire(locks.server_lock_path(), exclusive=False)
+    await _timed(app.state.startup_timings, "database", init_db())
+    await _timed(app.state.startup_timings, "message_recovery", message_writer.abort_interrupted())
+    await _timed(app.state.startup_timings, "ingestion", ingestion_service.start())
+    background.spawn(_warmup(app))
     yield
     # Shutdown
-    pass
+    await ingestion_service.stop()
+    await message_writer.drain()
+    await background.drain()
+    embedding_executor.shutdown()
+    vectorstore_executor.shutdown()
+    rerank_executor.shutdown()
+    shutdown_process_pool()
+    await engine.dispose()
+    locks.release(server_lock)
 
 app = FastAPI(
     title="Fyora Chat API",
@@ -19,13 +100,21 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-# CORS configuration
+# Reject oversized uploads from their headers before reading the body
+app.add_middleware(
+    UploadLimitMiddleware,
+    path_suffix="/documents/upload",
+    max_size=settings.max_upload_size_mb * 1024 * 1024
+)
+
+# CORS configuration (added last so it also wraps early upload rejections)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Include routers
@@ -39,4 +128,20 @@ async def root():
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy"}
\ No newline at end of file
+    """Liveness: the process is up and serving requests"""
+    return {"status": "healthy"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Latency histograms and counters in the Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/ready")
+async def ready():
+    """Readiness: models are loaded and stores are open, so requests will not pay startup costs"""
+    body = {"startup_ms": app.state.startup_timings}
+    if app.state.ready:
+        return {"status": "ready", **body}
+    if app.state.warmup_error:
+        body["error"] = app.state.warmup_error
+    return JSONResponse(status_code=503, content={"status": "warming_up", **body})
\ No newline at end of file
@@ -1,6 +1,8 @@
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Boolean, Integer
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Boolean, Integer, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
+from typing import List
+import json
 import uuid
 from app.database import Base
 
@@ -14,8 +16,24 @@ class Thread(Base):
     title = Column(String(255), default="New Conversation")
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    history_summary = Column(Text, nullable=True)  # Rolling summary of turns older than the history window
+    summarized_count = Column(Integer, default=0)  # Oldest messages already folded into history_summary
+    pinned_documents = Column(Text, nullable=True)  # JSON list of document ids retrieval is scoped to
     
     messages = relationship("Message", back_populates="thread", cascade="all, delete-orphan")
+    
+    @property
+    def pinned_document_ids(self) -> List[str]:
+        return json.loads(self.pinned_documents) if self.pinned_documents else []
+    
+    @pinned_document_ids.setter
+    def pinned_document_ids(self, document_ids: List[str]):
+        self.pinned_documents = json.dumps(list(dict.fromkeys(document_ids))) if document_ids else None
+    
+    # Thread list is paginated newest first on (updated_at, id)
+    __table_args__ = (
+        Index("ix_threads_updated_at_id", "updated_at", "id"),
+    )
 
 class Message(Base):
     __tablename__ = "messages"
@@ -25,9 +43,15 @@ class Message(Base):
     role = Column(String(20), nullable=False)  # 'user' or 'assistant'
     content = Column(Text, nullable=False)
     sources = Column(Text, nullable=True)  # JSON string of sources
+    status = Column(String(20), default="complete")  # 'streaming', 'complete' or 'aborted'
     created_at = Column(DateTime, default=datetime.utcnow)
     
     thread = relationship("Thread", back_populates="messages")
+    
+    # History is always read per thread in creation order
+    __table_args__ = (
+        Index("ix_messages_thread_id_created_at", "thread_id", "created_at", "id"),
+    )
 
 class Document(Base):
     __tablename__ = "documents"
@@ -38,4 +62,22 @@ class Document(Base):
     file_type = Column(String(50), nullable=False)
     chunk_count = Column(Integer, default=0)
     uploaded_at = Column(DateTime, default=datetime.utcnow)
-    processed = Column(Boolean, default=False)
\ No newline at end of file
+    processed = Column(Boolean, default=False)
+    content_hash = Column(String(64), nullable=True, index=True)  # SHA-256 of the uploaded file
+    status = Column(String(20), default="pending")  # 'pending', 'processing', 'completed' or 'failed'
+    page_count = Column(Integer, default=0)
+    pages_parsed = Column(Integer, default=0)
+    chunks_embedded = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    
+    # At most one live document per file content, so concurrent identical uploads can't both insert;
+    # a failed document leaves the index and the same file can be uploaded again
+    __table_args__ = (
+        Index(
+            "uq_documents_content_hash_live",
+            "content_hash",
+            unique=True,
+            sqlite_where=text("status != 'failed'"),
+            postgresql_where=text("status != 'failed'")
+        ),
+    )
\ No newline at end of file
@@ -1,173 +1,378 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, HTTPException
 from fastapi.responses import StreamingResponse
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import func, select, update
 from sse_starlette.sse import EventSourceResponse
-from typing import AsyncGenerator
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from typing import AsyncGenerator, Dict, List, Optional, Tuple
+import asyncio
 import json
-from app.database import get_db
+import time
+from app.config import settings
+from app.database import async_session
 from app.models import Thread, Message
+from app.routers.documents import check_documents_exist
 from app.schemas import ChatRequest
+from app.services.answer_cache import answer_cache, replay
 from app.services.llm_service import llm_service
+from app.services.message_writer import message_writer
 from app.services.rag_service import rag_service
 from app.services.search_service import search_service
+from app.utils import background
+from app.utils.metrics import CHAT_STAGE_SECONDS, LLM_OUTPUT_TOKENS, LLM_TOKENS_PER_SECOND
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
-@router.post("/")
-async def chat(
-    request: ChatRequest,
-    db: AsyncSession = Depends(get_db)
-):
-    # Get thread
-    result = await db.execute(
-        select(Thread).where(Thread.id == request.thread_id)
-    )
-    thread = result.scalar_one_or_none()
-    if not thread:
-        raise HTTPException(status_code=404, detail="Thread not found")
+@dataclass
+class ChatContext:
+    endpoint: str = "chat"
+    chat_history: List[Dict] = field(default_factory=list)
+    rag_context: List[Dict] = field(default_factory=list)
+    web_context: List[Dict] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)
+    started: float = field(default_factory=time.perf_counter)
     
-    # Get chat history
-    result = await db.execute(
-        select(Message)
-        .where(Message.thread_id == request.thread_id)
-        .order_by(Message.created_at)
-    )
-    messages = result.scalars().all()
-    chat_history = [{"role": m.role, "content": m.content} for m in messages]
+    def record(self, stage: str, seconds: float):
+        """Add a stage duration to the response timings and the latency histogram"""
+        self.timings[f"{stage}_ms"] = round(seconds * 1000, 1)
+        CHAT_STAGE_SECONDS.observe(seconds, endpoint=self.endpoint, stage=stage)
     
-    # Gather context
-    rag_context = []
-    web_context = []
-    sources = []
+    def record_generation(self, response: str, seconds: float):
+        """Record generation time and output token throughput of a live LLM response"""
+        self.record("generation", seconds)
+        tokens = llm_service.context_builder.count(response)
+        LLM_OUTPUT_TOKENS.inc(tokens)
+        self.timings["output_tokens"] = tokens
+        if tokens and seconds > 0:
+            self.timings["tokens_per_second"] = round(tokens / seconds, 1)
+            LLM_TOKENS_PER_SECOND.observe(tokens / seconds)
+
+    @property
+    def sources(self) -> List[Dict]:
+        return (
+            [{"type": "document", **r} for r in self.rag_context] +
+            [{"type": "web", **r} for r in self.web_context]
+        )
+
+def _event(payload: Dict) -> Dict:
+    """SSE event carrying a JSON payload; EventSourceResponse adds the data: framing"""
+    return {"data": json.dumps(payload)}
+
+async def _generate_title(thread_id: str, message: str) -> str:
+    """Title a new thread in the background, persisting it in its own session"""
+    try:
+        title = await asyncio.wait_for(llm_service.generate_title(message), settings.title_timeout)
+    except Exception as e:
+        print(f"Title generation error: {e or type(e).__name__}")
+        title = ""
+    title = title or llm_service.fallback_title(message)
     
+    async with async_session() as db:
+        await db.execute(update(Thread).where(Thread.id == thread_id).values(title=title))
+        await db.commit()
+    return title
+
+def _start_title(thread_id: str, message: str) -> asyncio.Task:
+    return background.spawn(_generate_title(thread_id, message))
+
+async def _cached_answer(request: ChatRequest, context: ChatContext) -> Tuple[Optional[str], Optional[Tuple]]:
+    """A cached answer to a near-identical question over the same context, and the key to cache a new one under"""
+    # Answers to follow-up questions depend on the conversation, so only opening questions are cached
+    if not settings.answer_cache_enabled or context.chat_history:
+        return None, None
+    try:
+        embedding = await rag_service.embed_query(request.message)
+    except Exception as e:
+        print(f"Answer cache error: {e}")
+        return None, None
+    cache_key = (embedding, answer_cache.context_key(context.rag_context, context.web_context))
+    return answer_cache.get(*cache_key), cache_key
+
+async def _finish_stream(message_id: str, checkpoint: Optional[asyncio.Task], content: str, status: str):
+    """Write the final state of a streamed response after any checkpoint still in flight"""
+    if checkpoint is not None:
+        await asyncio.gather(checkpoint, return_exceptions=True)
+    await message_writer.update(message_id, content=content, status=status)
+
+def _current_title(thread: Thread, title_task: asyncio.Task, message: str) -> str:
+    """Generated title if ready, otherwise the cheap fallback"""
+    if title_task is None:
+        return thread.title
+    if title_task.done() and not title_task.cancelled() and not title_task.exception():
+        return title_task.result()
+    return llm_service.fallback_title(message)
+
+async def _get_thread(thread_id: str) -> Optional[Thread]:
+    async with async_session() as db:
+        return await db.get(Thread, thread_id)
+
+async def _check_documents(document_ids: Optional[List[str]]):
+    async with async_session() as db:
+        await check_documents_exist(db, document_ids)
+
+async def _load_history(thread_id: str) -> List[Dict]:
+    """The most recent turns the prompt can use; older ones live in the thread's rolling summary"""
+    async with async_session() as db:
+        result = await db.execute(
+            select(Message.role, Message.content)
+            .where(Message.thread_id == thread_id, Message.status != "streaming")
+            .order_by(Message.created_at.desc(), Message.id.desc())
+            .limit(settings.history_max_messages)
+        )
+    return [{"role": role, "content": content} for role, content in reversed(result.all())]
+
+async def _update_summary(thread_id: str):
+    """Fold messages that have left the history window into the thread's rolling summary"""
+    try:
+        async with async_session() as db:
+            thread = await db.get(Thread, thread_id)
+            if thread is None:
+                return
+            summarized = thread.summarized_count or 0
+            total = await db.scalar(
+                select(func.count()).select_from(Message).where(Message.thread_id == thread_id)
+            )
+            pending = total - settings.history_max_messages - summarized
+            if pending <= 0:
+                return
+            
+            result = await db.execute(
+                select(Message.role, Message.content)
+                .where(Message.thread_id == thread_id)
+                .order_by(Message.created_at, Message.id)
+                .offset(summarized)
+                .limit(pending)
+            )
+            turns = [{"role": role, "content": content} for role, content in result.all()]
+            summary = llm_service.extend_summary(thread.history_summary, turns)
+            
+            # Guarded on the old count so a concurrent update cannot fold the same turns twice
+            await db.execute(
+                update(Thread)
+                .where(Thread.id == thread_id, Thread.summarized_count == thread.summarized_count)
+                .values(history_summary=summary, summarized_count=summarized + len(turns))
+            )
+            await db.commit()
+    except Exception as e:
+        print(f"History summary error: {e}")
+
+async def _gather_context(
+    request: ChatRequest,
+    context: ChatContext,
+    thread: Thread
+) -> AsyncGenerator[Dict, None]:
+    """Load history, retrieve documents and search the web concurrently, yielding an event as each finishes"""
+    stages = {"history": (_load_history(request.thread_id), None)}
     if request.enable_rag:
-        rag_context = await rag_service.search(request.message)
-        sources.extend([{"type": "document", **r} for r in rag_context])
-    
+        # Documents named in the request take precedence over those pinned to the thread
+        document_ids = request.document_ids or thread.pinned_document_ids or None
+        stages["rag"] = (
+            rag_service.search(request.message, k=request.k, rerank=request.rerank, document_ids=document_ids),
+            settings.rag_timeout
+        )
     if request.enable_web_search:
-        web_context = await search_service.search(request.message)
-        sources.extend([{"type": "web", **r} for r in web_context])
+        stages["web"] = (search_service.search(request.message), settings.web_search_timeout)
+    
+    async def run_stage(name, coro, timeout):
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            result = await asyncio.wait_for(coro, timeout)
+        except asyncio.TimeoutError:
+            result, timed_out = [], True
+        except Exception as e:
+            # Retrieval failures degrade to no context; history is required
+            if name == "history":
+                raise
+            print(f"Context error ({name}): {e}")
+            result = []
+        return name, result, timed_out, time.perf_counter() - started
+    
+    started = time.perf_counter()
+    tasks = [asyncio.create_task(run_stage(name, coro, timeout)) for name, (coro, timeout) in stages.items()]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            name, result, timed_out, seconds = await next_done
+            setattr(context, {"history": "chat_history", "rag": "rag_context", "web": "web_context"}[name], result)
+            context.record(name, seconds)
+            yield {"stage": name, "duration_ms": round(seconds * 1000, 1), "results": len(result), "timed_out": timed_out}
+    finally:
+        for task in tasks:
+            task.cancel()
+    context.record("context", time.perf_counter() - started)
+
+@router.post("/")
+async def chat(request: ChatRequest):
+    # Sessions are opened only for individual reads and writes, never across generation
+    thread = await _get_thread(request.thread_id)
+    if not thread:
+        raise HTTPException(status_code=404, detail="Thread not found")
+    await _check_documents(request.document_ids)
+    
+    # Gather history and context concurrently
+    context = ChatContext()
+    async for _ in _gather_context(request, context, thread):
+        pass
+    chat_history = context.chat_history
+    rag_context = context.rag_context
+    web_context = context.web_context
+    sources = context.sources
+    
+    # Title a new thread while the response is generated
+    title_task = _start_title(request.thread_id, request.message) if not chat_history else None
     
     # Save user message
-    user_message = Message(
-        thread_id=request.thread_id,
-        role="user",
-        content=request.message
-    )
-    db.add(user_message)
+    await message_writer.add(thread_id=request.thread_id, role="user", content=request.message)
     
     # Generate response
-    response = await llm_service.generate_response(
+    started = time.perf_counter()
+    prompt = llm_service.build_prompt(
         message=request.message,
         chat_history=chat_history,
         rag_context=rag_context,
-        web_context=web_context
+        web_context=web_context,
+        history_summary=thread.history_summary
     )
+    context.record("prompt", time.perf_counter() - started)
+    cached, cache_key = await _cached_answer(request, context)
+    if cached is not None:
+        response = cached
+    else:
+        started = time.perf_counter()
+        response = await llm_service.generate_response(prompt)
+        context.record_generation(response, time.perf_counter() - started)
+        if cache_key is not None:
+            answer_cache.set(*cache_key, response)
     
     # Save assistant message
-    assistant_message = Message(
+    await message_writer.add(
         thread_id=request.thread_id,
         role="assistant",
         content=response,
         sources=json.dumps(sources) if sources else None
     )
-    db.add(assistant_message)
-    
-    # Update thread title if first message
-    if len(messages) == 0:
-        thread.title = await llm_service.generate_title(request.message)
-    
-    await db.commit()
+    background.spawn(_update_summary(request.thread_id))
+    context.record("total", time.perf_counter() - context.started)
     
     return {
         "message": response,
         "sources": sources,
-        "thread_id": request.thread_id
+        "thread_id": request.thread_id,
+        "thread_title": _current_title(thread, title_task, request.message),
+        "prompt_tokens": prompt.token_counts,
+        "timings": context.timings if request.include_timings else None,
+        "cached": cached is not None
     }
 
 @router.post("/stream")
-async def chat_stream(
-    request: ChatRequest,
-    db: AsyncSession = Depends(get_db)
-):
-    async def event_generator() -> AsyncGenerator[str, None]:
-        # Get thread
-        result = await db.execute(
-            select(Thread).where(Thread.id == request.thread_id)
-        )
-        thread = result.scalar_one_or_none()
+async def chat_stream(request: ChatRequest):
+    async def event_generator() -> AsyncGenerator[Dict, None]:
+        # No connection is held while the response streams; each read and write uses its own short session
+        thread = await _get_thread(request.thread_id)
         if not thread:
-            yield f"data: {json.dumps({'error': 'Thread not found'})}\n\n"
+            yield _event({'error': 'Thread not found'})
             return
         
-        # Get chat history
-        result = await db.execute(
-            select(Message)
-            .where(Message.thread_id == request.thread_id)
-            .order_by(Message.created_at)
-        )
-        messages = result.scalars().all()
-        chat_history = [{"role": m.role, "content": m.content} for m in messages]
-        
-        # Gather context
-        rag_context = []
-        web_context = []
-        sources = []
-        
         # Send status updates
-        yield f"data: {json.dumps({'status': 'thinking'})}\n\n"
-        
+        yield _event({'status': 'thinking'})
         if request.enable_rag:
-            yield f"data: {json.dumps({'status': 'retrieving'})}\n\n"
-            rag_context = await rag_service.search(request.message)
-            sources.extend([{"type": "document", **r} for r in rag_context])
-        
+            yield _event({'status': 'retrieving'})
         if request.enable_web_search:
-            yield f"data: {json.dumps({'status': 'searching'})}\n\n"
-            web_context = await search_service.search(request.message)
-            sources.extend([{"type": "web", **r} for r in web_context])
+            yield _event({'status': 'searching'})
+        
+        # Gather history and context concurrently, reporting each source as it completes
+        context = ChatContext(endpoint="stream")
+        async for event in _gather_context(request, context, thread):
+            yield _event(event)
+        chat_history = context.chat_history
+        rag_context = context.rag_context
+        web_context = context.web_context
+        sources = context.sources
         
         # Send sources
         if sources:
-            yield f"data: {json.dumps({'sources': sources})}\n\n"
+            yield _event({'sources': sources})
         
-        # Save user message
-        user_message = Message(
-            thread_id=request.thread_id,
-            role="user",
-            content=request.message
-        )
-        db.add(user_message)
+        # Title a new thread while the response streams
+        title_task = _start_title(request.thread_id, request.message) if not chat_history else None
+        
+        # Save user message before generation starts
+        await message_writer.add(thread_id=request.thread_id, role="user", content=request.message)
         
         # Stream response
-        yield f"data: {json.dumps({'status': 'generating'})}\n\n"
+        yield _event({'status': 'generating'})
         
-        full_response = ""
-        async for chunk in llm_service.generate_stream(
+        started = time.perf_counter()
+        prompt = llm_service.build_prompt(
             message=request.message,
             chat_history=chat_history,
             rag_context=rag_context,
-            web_context=web_context
-        ):
-            full_response += chunk
-            yield f"data: {json.dumps({'chunk': chunk})}\n\n"
+            web_context=web_context,
+            history_summary=thread.history_summary
+        )
+        context.record("prompt", time.perf_counter() - started)
+        cached, cache_key = await _cached_answer(request, context)
         
-        # Save assistant message
-        assistant_message = Message(
+        # The response is saved as it streams so a disconnect or crash keeps what was generated
+        assistant_id = await message_writer.add(
             thread_id=request.thread_id,
             role="assistant",
-            content=full_response,
-            sources=json.dumps(sources) if sources else None
+            content="",
+            sources=json.dumps(sources) if sources else None,
+            status="streaming"
         )
-        db.add(assistant_message)
+        parts: List[str] = []
+        status = "aborted"
+        checkpoint = None
+        last_checkpoint = time.monotonic()
+        started = time.perf_counter()
+        try:
+            # aclosing stops the upstream LLM call as soon as the client goes away
+            source = replay(cached) if cached is not None else llm_service.generate_stream(prompt)
+            async with aclosing(source) as stream:
+                async for chunk in stream:
+                    if not parts and cached is None:
+                        context.record("first_token", time.perf_counter() - started)
+                    parts.append(chunk)
+                    yield _event({'chunk': chunk})
+                    
+                    if time.monotonic() - last_checkpoint >= settings.stream_checkpoint_interval and (checkpoint is None or checkpoint.done()):
+                        checkpoint = background.spawn(
+                            message_writer.update(assistant_id, content="".join(parts), status="streaming")
+                        )
+                        last_checkpoint = time.monotonic()
+            status = "complete"
+        finally:
+            # A separate task, so the final write survives the cancellation of this one on disconnect
+            finished = background.spawn(_finish_stream(assistant_id, checkpoint, "".join(parts), status))
         
-        # Update thread title if first message
-        if len(messages) == 0:
-            thread.title = await llm_service.generate_title(request.message)
+        if cached is None:
+            context.record_generation("".join(parts), time.perf_counter() - started)
+        await finished
+        if cached is None and cache_key is not None:
+            answer_cache.set(*cache_key, "".join(parts))
+        background.spawn(_update_summary(request.thread_id))
+        context.record("total", time.perf_counter() - context.started)
         
-        await db.commit()
+        title = _current_title(thread, title_task, request.message)
+        done = {'done': True, 'thread_title': title, 'prompt_tokens': prompt.token_counts, 'cached': cached is not None}
+        if request.include_timings:
+            done['timings'] = context.timings
+        yield _event(done)
         
-        yield f"data: {json.dumps({'done': True, 'thread_title': thread.title})}\n\n"
+        # Push the generated title if it was still pending at completion
+        if title_task and not title_task.done():
+            try:
+                title = await asyncio.shield(title_task)
+                yield _event({'thread_title': title})
+            except Exception:
+                pass
     
-    return EventSourceResponse(event_generator())
\ No newline at end of file
+    # Checked before the stream starts, so unknown documents get a 404 rather than an error event
+    await _check_documents(request.document_ids)
+    return EventSourceResponse(event_generator())
+
+@router.get("/cache")
+async def answer_cache_stats():
+    """Answer cache size and hit rate"""
+    return {"enabled": settings.answer_cache_enabled, **answer_cache.stats()}
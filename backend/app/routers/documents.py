@@ -1,74 +1,99 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Response, UploadFile, File
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from typing import List
 import os
+import time
 import uuid
 from app.database import get_db
 from app.models import Document
-from app.schemas import DocumentResponse
+from app.schemas import DocumentResponse, DocumentStatusResponse
 from app.config import settings
+from app.services.ingestion_service import ingestion_service
 from app.services.rag_service import rag_service
-from app.utils.document_processor import process_document, get_file_type
+from app.utils.document_processor import get_file_type
+from app.utils.metrics import UPLOAD_SECONDS
+from app.utils.uploads import limit_message, save_upload, UNSUPPORTED_TYPE_MESSAGE, UploadTooLarge
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
-@router.post("/upload", response_model=DocumentResponse)
+async def check_documents_exist(db: AsyncSession, document_ids: List[str]):
+    """Raise a 404 naming any of the document ids that no document has"""
+    if not document_ids:
+        return
+    found = set(await db.scalars(select(Document.id).where(Document.id.in_(document_ids))))
+    missing = [document_id for document_id in dict.fromkeys(document_ids) if document_id not in found]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Documents not found: {', '.join(missing)}")
+
+async def _live_document(db: AsyncSession, content_hash: str):
+    result = await db.execute(
+        select(Document)
+        .where(Document.content_hash == content_hash, Document.status != "failed")
+        .limit(1)
+    )
+    return result.scalar_one_or_none()
+
+@router.post("/upload", response_model=DocumentResponse, status_code=202)
 async def upload_document(
+    response: Response,
     file: UploadFile = File(...),
     db: AsyncSession = Depends(get_db)
 ):
     # Validate file type
     file_type = get_file_type(file.filename)
     if file_type == "unknown":
-        raise HTTPException(
-            status_code=400,
-            detail="Unsupported file type. Allowed: PDF, DOCX, TXT, MD"
-        )
+        raise HTTPException(status_code=400, detail=UNSUPPORTED_TYPE_MESSAGE)
+    
+    max_size = settings.max_upload_size_mb * 1024 * 1024
+    if file.size is not None and file.size > max_size:
+        raise HTTPException(status_code=413, detail=limit_message(max_size))
     
-    # Save file
+    # Save file in chunks without holding it in memory
     file_id = str(uuid.uuid4())
     file_path = os.path.join(settings.upload_dir, f"{file_id}_{file.filename}")
     
-    with open(file_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
+    started = time.perf_counter()
+    try:
+        _, content_hash = await save_upload(file, file_path, max_size)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    UPLOAD_SECONDS.observe(time.perf_counter() - started)
     
-    # Create document record
+    # Identical files short-circuit to the existing document
+    existing = await _live_document(db, content_hash)
+    if existing:
+        os.remove(file_path)
+        response.status_code = 200
+        return existing
+    
+    # Create document record; the document id doubles as the ingestion job id
     document = Document(
         id=file_id,
         filename=file.filename,
         file_path=file_path,
         file_type=file_type,
-        processed=False
+        processed=False,
+        status="pending",
+        content_hash=content_hash
     )
     db.add(document)
-    
     try:
-        # Process document
-        text, _ = await process_document(file_path, file_type)
-        
-        # Add to vector store
-        chunk_count = await rag_service.add_documents(
-            text=text,
-            metadata={
-                "document_id": file_id,
-                "filename": file.filename,
-                "file_type": file_type
-            }
-        )
-        
-        document.chunk_count = chunk_count
-        document.processed = True
         await db.commit()
-        await db.refresh(document)
-        
-    except Exception as e:
+    except IntegrityError:
+        # An identical upload committed between the check above and this insert
         await db.rollback()
-        # Clean up file
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
+        os.remove(file_path)
+        existing = await _live_document(db, content_hash)
+        if existing is None:
+            raise
+        response.status_code = 200
+        return existing
+    await db.refresh(document)
+    
+    # Parsing and embedding happen in the background
+    await ingestion_service.enqueue(file_id)
     
     return document
 
@@ -79,6 +104,24 @@ async def get_documents(db: AsyncSession = Depends(get_db)):
     )
     return result.scalars().all()
 
+@router.get("/{document_id}/status", response_model=DocumentStatusResponse)
+async def get_document_status(document_id: str, db: AsyncSession = Depends(get_db)):
+    result = await db.execute(
+        select(Document).where(Document.id == document_id)
+    )
+    document = result.scalar_one_or_none()
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    status = DocumentStatusResponse.model_validate(document, from_attributes=True)
+    
+    # Overlay live progress of an in-flight job
+    progress = ingestion_service.get_progress(document_id)
+    if progress:
+        status = status.model_copy(update=progress)
+    
+    return status
+
 @router.delete("/{document_id}")
 async def delete_document(document_id: str, db: AsyncSession = Depends(get_db)):
     result = await db.execute(
@@ -88,8 +131,12 @@ async def delete_document(document_id: str, db: AsyncSession = Depends(get_db)):
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    # Delete from vector store
-    await rag_service.delete_document(document_id)
+    # Delete from vector store first; if that fails the record stays so the delete can be retried
+    try:
+        await rag_service.delete_document(document_id)
+    except Exception as e:
+        print(f"Delete error: {e}")
+        raise HTTPException(status_code=503, detail="Vector store unavailable, document not deleted")
     
     # Delete file
     if os.path.exists(document.file_path):
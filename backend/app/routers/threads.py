@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, tuple_
 from sqlalchemy.orm import selectinload
-from typing import List
+from typing import List, Optional
 from app.database import get_db
 from app.models import Thread, Message
+from app.routers.documents import check_documents_exist
 from app.schemas import ThreadCreate, ThreadResponse, ThreadUpdate
+from app.utils.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
 
 router = APIRouter(prefix="/threads", tags=["threads"])
 
@@ -15,17 +17,33 @@ async def create_thread(
     db: AsyncSession = Depends(get_db)
 ):
     thread = Thread(title=thread_data.title if thread_data else "New Conversation")
+    if thread_data:
+        await check_documents_exist(db, thread_data.pinned_document_ids)
+        thread.pinned_document_ids = thread_data.pinned_document_ids
     db.add(thread)
     await db.commit()
     await db.refresh(thread)
     return thread
 
 @router.get("/", response_model=List[ThreadResponse])
-async def get_threads(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        select(Thread).order_by(Thread.updated_at.desc())
-    )
-    return result.scalars().all()
+async def get_threads(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Threads, most recently updated first; the next page's cursor is in the X-Next-Cursor header"""
+    query = select(Thread).order_by(Thread.updated_at.desc(), Thread.id.desc())
+    if cursor:
+        query = query.where(tuple_(Thread.updated_at, Thread.id) < tuple_(*decode_cursor(cursor)))
+    
+    result = await db.execute(query.limit(limit + 1))
+    threads = result.scalars().all()
+    
+    if len(threads) > limit:
+        threads = threads[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(threads[-1].updated_at, threads[-1].id)
+    return threads
 
 @router.get("/{thread_id}", response_model=ThreadResponse)
 async def get_thread(thread_id: str, db: AsyncSession = Depends(get_db)):
@@ -38,19 +56,37 @@ async def get_thread(thread_id: str, db: AsyncSession = Depends(get_db)):
     return thread
 
 @router.get("/{thread_id}/messages")
-async def get_thread_messages(thread_id: str, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
+async def get_thread_messages(
+    thread_id: str,
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """The latest messages in chronological order; X-Next-Cursor pages back to older messages"""
+    query = (
         select(Message)
         .where(Message.thread_id == thread_id)
-        .order_by(Message.created_at)
+        .order_by(Message.created_at.desc(), Message.id.desc())
     )
+    if cursor:
+        query = query.where(tuple_(Message.created_at, Message.id) < tuple_(*decode_cursor(cursor)))
+    
+    result = await db.execute(query.limit(limit + 1))
     messages = result.scalars().all()
+    
+    if len(messages) > limit:
+        messages = messages[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(messages[-1].created_at, messages[-1].id)
+    messages.reverse()
+    
     return [
         {
             "id": msg.id,
             "role": msg.role,
             "content": msg.content,
             "sources": msg.sources,
+            "status": msg.status,
             "created_at": msg.created_at.isoformat()
         }
         for msg in messages
@@ -69,7 +105,11 @@ async def update_thread(
     if not thread:
         raise HTTPException(status_code=404, detail="Thread not found")
     
-    thread.title = thread_data.title
+    if thread_data.title is not None:
+        thread.title = thread_data.title
+    if thread_data.pinned_document_ids is not None:
+        await check_documents_exist(db, thread_data.pinned_document_ids)
+        thread.pinned_document_ids = thread_data.pinned_document_ids
     await db.commit()
     await db.refresh(thread)
     return thread
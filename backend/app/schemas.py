@@ -1,22 +1,25 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict
 from datetime import datetime
 
 # Thread Schemas
 class ThreadCreate(BaseModel):
     title: Optional[str] = "New Conversation"
+    pinned_document_ids: List[str] = []
 
 class ThreadResponse(BaseModel):
     id: str
     title: str
     created_at: datetime
     updated_at: datetime
+    pinned_document_ids: List[str] = []
     
     class Config:
         from_attributes = True
 
 class ThreadUpdate(BaseModel):
-    title: str
+    title: Optional[str] = None
+    pinned_document_ids: Optional[List[str]] = None  # replaces the pinned set; [] unpins all
 
 # Message Schemas
 class MessageCreate(BaseModel):
@@ -40,11 +43,16 @@ class ChatRequest(BaseModel):
     thread_id: str
     enable_web_search: bool = False
     enable_rag: bool = True
+    k: int = Field(3, ge=1, le=20)  # document chunks to retrieve
+    rerank: Optional[bool] = None  # defaults to RERANK_ENABLED
+    include_timings: bool = True  # per-stage timing breakdown in the response
+    document_ids: Optional[List[str]] = None  # restricts retrieval; defaults to the thread's pinned documents
 
 class ChatResponse(BaseModel):
     message: str
     sources: List[dict] = []
     thread_id: str
+    prompt_tokens: Dict[str, int] = {}
 
 # Document Schemas
 class DocumentResponse(BaseModel):
@@ -54,6 +62,17 @@ class DocumentResponse(BaseModel):
     chunk_count: int
     uploaded_at: datetime
     processed: bool
+    status: str = "completed"
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class DocumentStatusResponse(BaseModel):
+    id: str
+    status: str
+    processed: bool
+    page_count: int = 0
+    pages_parsed: int = 0
+    chunks_embedded: int = 0
+    chunk_count: int = 0
+    error: Optional[str] = None
\ No newline at end of file
@@ -0,0 +1,108 @@
+from collections import OrderedDict
+from typing import AsyncGenerator, Dict, FrozenSet, Hashable, List, Optional, Set, Tuple
+import asyncio
+import numpy as np
+import time
+from app.config import settings
+
+# Cached answers are replayed in pieces of about this many characters
+REPLAY_CHUNK_CHARS = 64
+
+class AnswerCache:
+    """Size-bounded LRU of generated answers, matched by query embedding similarity.
+
+    An answer is only reused for a query retrieving exactly the same chunks and
+    web results, so it stops matching once the underlying documents change.
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: Optional[float] = None, threshold: float = 0.95):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, Tuple[FrozenSet, np.ndarray, str, Optional[float]]]" = OrderedDict()
+        self._buckets: Dict[FrozenSet, Set[int]] = {}
+        self._next_id = 0
+
+    @staticmethod
+    def context_key(rag_context: List[Dict], web_context: List[Dict]) -> FrozenSet[Hashable]:
+        """Identity of the retrieved context an answer was generated from"""
+        chunks = {
+            ("chunk", r.get("metadata", {}).get("document_id"), r.get("metadata", {}).get("chunk_index"))
+            for r in rag_context
+        }
+        return frozenset(chunks | {("web", r.get("url")) for r in web_context})
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _remove(self, entry_id: int):
+        context, _, _, _ = self._entries.pop(entry_id)
+        bucket = self._buckets[context]
+        bucket.discard(entry_id)
+        if not bucket:
+            del self._buckets[context]
+
+    def get(self, embedding: List[float], context: FrozenSet) -> Optional[str]:
+        """Cached answer for the most similar earlier query with the same context, if similar enough"""
+        query = self._normalize(embedding)
+        now = time.monotonic()
+        best_id, best_similarity = None, self.threshold
+        for entry_id in list(self._buckets.get(context, ())):
+            _, vector, _, expires_at = self._entries[entry_id]
+            if expires_at is not None and expires_at <= now:
+                self._remove(entry_id)
+                continue
+            similarity = float(np.dot(query, vector))
+            if similarity >= best_similarity:
+                best_id, best_similarity = entry_id, similarity
+
+        if best_id is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(best_id)
+        self.hits += 1
+        return self._entries[best_id][2]
+
+    def set(self, embedding: List[float], context: FrozenSet, answer: str):
+        if self.maxsize <= 0 or not answer:
+            return
+        entry_id = self._next_id
+        self._next_id += 1
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        self._entries[entry_id] = (context, self._normalize(embedding), answer, expires_at)
+        self._buckets.setdefault(context, set()).add(entry_id)
+        while len(self._entries) > self.maxsize:
+            self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        self._entries.clear()
+        self._buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+async def replay(answer: str) -> AsyncGenerator[str, None]:
+    """Stream a cached answer in the same chunked form as a live generation"""
+    for start in range(0, len(answer), REPLAY_CHUNK_CHARS):
+        yield answer[start:start + REPLAY_CHUNK_CHARS]
+        await asyncio.sleep(0)
+
+answer_cache = AnswerCache(
+    maxsize=settings.answer_cache_size,
+    ttl=settings.answer_cache_ttl,
+    threshold=settings.answer_cache_threshold
+)
@@ -0,0 +1,375 @@
+from app.utils import locks
+from typing import Dict, Iterable, List, Optional, Tuple
+import json
+import math
+import numpy as np
+import os
+import re
+import threading
+
+# Identifiers such as error codes, dotted names and paths are kept whole and also split into parts
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[._\-/:][a-z0-9]+)*")
+TOKEN_SEPARATORS = re.compile(r"[._\-/:]")
+STOPWORDS = frozenset(
+    "a an and are as at be but by do does for from had has have how i if in into is it its "
+    "me my no not of on or so than that the their them then there these they this to was "
+    "we were what when where which who why will with you your".split()
+)
+MAX_TERM_FREQUENCY = np.iinfo(np.uint16).max
+# Version 2 stores each chunk's document id; version 1 derived it from the chunk id
+FORMAT_VERSION = 2
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(part for part in TOKEN_SEPARATORS.split(token) if part and part not in STOPWORDS)
+    return tokens
+
+class _Segment:
+    """Immutable postings for a batch of chunks, stored term-major as CSR arrays"""
+
+    def __init__(self, name: str, term_ids: np.ndarray, offsets: np.ndarray, docs: np.ndarray, tfs: np.ndarray):
+        self.name = name
+        self.term_ids = term_ids
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+
+    @classmethod
+    def build(cls, name: str, term_ids: np.ndarray, docs: np.ndarray, tfs: np.ndarray) -> "_Segment":
+        order = np.lexsort((docs, term_ids))
+        term_ids, docs, tfs = term_ids[order], docs[order], tfs[order]
+        unique_terms, starts = np.unique(term_ids, return_index=True)
+        offsets = np.append(starts, len(term_ids)).astype(np.int64)
+        return cls(name, unique_terms.astype(np.uint32), offsets, docs.astype(np.uint32), tfs.astype(np.uint16))
+
+    @classmethod
+    def load(cls, path: str) -> "_Segment":
+        with np.load(path) as data:
+            return cls(
+                os.path.basename(path),
+                data["term_ids"], data["offsets"], data["docs"], data["tfs"]
+            )
+
+    def save(self, directory: str):
+        path = os.path.join(directory, self.name)
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, term_ids=self.term_ids, offsets=self.offsets, docs=self.docs, tfs=self.tfs)
+        os.replace(path + ".tmp", path)
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def lookup(self, term_ids: np.ndarray) -> List[Tuple[int, np.ndarray, np.ndarray]]:
+        """(term id, docs, term frequencies) for each of the given terms present in this segment"""
+        positions = np.searchsorted(self.term_ids, term_ids)
+        found = []
+        for term_id, position in zip(term_ids, positions):
+            if position < len(self.term_ids) and self.term_ids[position] == term_id:
+                start, end = self.offsets[position], self.offsets[position + 1]
+                found.append((int(term_id), self.docs[start:end], self.tfs[start:end]))
+        return found
+
+    def triples(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return np.repeat(self.term_ids, np.diff(self.offsets)), self.docs, self.tfs
+
+class BM25Index:
+    """Incremental BM25 keyword index over chunks.
+
+    Each batch of added chunks becomes an immutable postings segment, and
+    neighbouring segments of similar size are merged so a query touches a
+    logarithmic number of them. Vocabulary, chunk and document ids, lengths and
+    deletions are append-only files; manifest.json records how much of each is
+    valid. Writers hold a lock file and reload first if another process has
+    replaced the manifest, so several processes can share one directory.
+    """
+
+    def __init__(self, directory: str, k1: float = 1.2, b: float = 0.75):
+        self.directory = directory
+        self.k1 = k1
+        self.b = b
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self.vocab_path = os.path.join(directory, "vocab.txt")
+        self.chunks_path = os.path.join(directory, "chunks.txt")
+        self.lengths_path = os.path.join(directory, "lengths.u32")
+        self.deleted_path = os.path.join(directory, "deleted.u32")
+        self.lock_path = os.path.join(directory, "lock")
+        self._lock = threading.Lock()
+        self._manifest_stamp = None
+
+        os.makedirs(directory, exist_ok=True)
+        with self._lock, locks.file_lock(self.lock_path):
+            self._reset_state()
+            self._load()
+
+    def _reset_state(self):
+        self._vocab: Dict[str, int] = {}
+        self._chunk_ids: List[str] = []
+        self._documents: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._by_document: Dict[str, List[int]] = {}
+        self._lengths = np.zeros(1024, dtype=np.uint32)
+        self._alive = np.zeros(1024, dtype=bool)
+        self._live = 0
+        self._live_length = 0
+        self._segments: List[_Segment] = []
+        self._next_segment = 0
+        self._sizes = {"vocab": 0, "chunks": 0, "lengths": 0, "deleted": 0}
+
+    def _stamp(self) -> Optional[Tuple[int, int]]:
+        # The manifest is replaced rather than rewritten, so a new inode means another write
+        try:
+            stat = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _refresh(self):
+        """Reload from disk if another process wrote the index since this one last read or wrote it"""
+        if self._stamp() != self._manifest_stamp:
+            self._reset_state()
+            self._load()
+
+    def _load(self):
+        self._manifest_stamp = self._stamp()
+        if self._manifest_stamp is None:
+            return
+
+        with open(self.manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("format") != FORMAT_VERSION:
+            # Left empty, the index is rebuilt from the vector store's metadata on startup
+            print("Keyword index format changed, discarding it for a rebuild")
+            self._remove(manifest["segments"])
+            self._clear()
+            return
+        self._sizes = manifest["sizes"]
+        self._next_segment = manifest["next_segment"]
+
+        terms = self._read(self.vocab_path, "vocab").decode().splitlines()
+        self._vocab = {term: i for i, term in enumerate(terms)}
+        rows = [line.split("\t") for line in self._read(self.chunks_path, "chunks").decode().splitlines()]
+        chunk_ids = [chunk_id for chunk_id, _ in rows]
+        lengths = np.frombuffer(self._read(self.lengths_path, "lengths"), dtype=np.uint32)
+        deleted = np.frombuffer(self._read(self.deleted_path, "deleted"), dtype=np.uint32)
+
+        self._grow(len(chunk_ids))
+        self._lengths[:len(lengths)] = lengths
+        self._alive[:len(chunk_ids)] = True
+        self._alive[deleted] = False
+        self._chunk_ids = chunk_ids
+        self._documents = [document_id for _, document_id in rows]
+        for i, chunk_id in enumerate(chunk_ids):
+            if self._alive[i]:
+                self._register(chunk_id, i)
+        self._live = int(self._alive[:len(chunk_ids)].sum())
+        self._live_length = int(self._lengths[:len(chunk_ids)][self._alive[:len(chunk_ids)]].sum())
+
+        self._segments = [_Segment.load(os.path.join(self.directory, name)) for name in manifest["segments"]]
+
+    def _read(self, path: str, key: str) -> bytes:
+        # Bytes past the manifest's size belong to a write that never completed
+        if not self._sizes[key]:
+            return b""
+        with open(path, "rb") as f:
+            return f.read(self._sizes[key])
+
+    def _grow(self, size: int):
+        if size <= len(self._lengths):
+            return
+        capacity = max(size, 2 * len(self._lengths))
+        self._lengths = np.concatenate([self._lengths, np.zeros(capacity - len(self._lengths), dtype=np.uint32)])
+        self._alive = np.concatenate([self._alive, np.zeros(capacity - len(self._alive), dtype=bool)])
+
+    def _register(self, chunk_id: str, index: int):
+        self._ids[chunk_id] = index
+        self._by_document.setdefault(self._documents[index], []).append(index)
+
+    def __len__(self) -> int:
+        return self._live
+
+    def _append(self, path: str, key: str, data: bytes):
+        with open(path, "ab") as f:
+            f.truncate(self._sizes[key])
+            f.write(data)
+        self._sizes[key] += len(data)
+
+    def _write_manifest(self):
+        manifest = {
+            "format": FORMAT_VERSION,
+            "segments": [segment.name for segment in self._segments],
+            "next_segment": self._next_segment,
+            "sizes": self._sizes
+        }
+        with open(self.manifest_path + ".tmp", "w") as f:
+            json.dump(manifest, f)
+        os.replace(self.manifest_path + ".tmp", self.manifest_path)
+        self._manifest_stamp = self._stamp()
+
+    def _tombstone(self, indexes: List[int]):
+        for index in indexes:
+            self._alive[index] = False
+            self._live -= 1
+            self._live_length -= int(self._lengths[index])
+            self._ids.pop(self._chunk_ids[index], None)
+        self._append(self.deleted_path, "deleted", np.asarray(indexes, dtype=np.uint32).tobytes())
+
+    def add(self, chunk_ids: List[str], texts: List[str], document_ids: List[str]):
+        """Index chunks of the given documents, replacing any already indexed under the same ids"""
+        counts = []
+        for text in texts:
+            tokens = tokenize(text)
+            frequencies: Dict[str, int] = {}
+            for token in tokens:
+                frequencies[token] = frequencies.get(token, 0) + 1
+            counts.append((len(tokens), frequencies))
+
+        with self._lock, locks.file_lock(self.lock_path):
+            self._refresh()
+            replaced = [self._ids[chunk_id] for chunk_id in chunk_ids if chunk_id in self._ids]
+            if replaced:
+                for index in replaced:
+                    document = self._by_document.get(self._documents[index])
+                    if document is not None:
+                        document.remove(index)
+                self._tombstone(replaced)
+
+            first = len(self._chunk_ids)
+            self._grow(first + len(chunk_ids))
+            new_terms = []
+            term_ids, docs, tfs = [], [], []
+            for i, (chunk_id, document_id, (length, frequencies)) in enumerate(zip(chunk_ids, document_ids, counts)):
+                index = first + i
+                for term, frequency in frequencies.items():
+                    term_id = self._vocab.get(term)
+                    if term_id is None:
+                        term_id = self._vocab[term] = len(self._vocab)
+                        new_terms.append(term)
+                    term_ids.append(term_id)
+                    docs.append(index)
+                    tfs.append(min(frequency, MAX_TERM_FREQUENCY))
+                self._chunk_ids.append(chunk_id)
+                self._documents.append(document_id or "")
+                self._register(chunk_id, index)
+                self._lengths[index] = length
+                self._alive[index] = True
+                self._live += 1
+                self._live_length += length
+
+            segment = _Segment.build(
+                f"seg-{self._next_segment:06d}.npz",
+                np.asarray(term_ids, dtype=np.uint32),
+                np.asarray(docs, dtype=np.uint32),
+                np.asarray(tfs, dtype=np.uint16)
+            )
+            self._next_segment += 1
+            segment.save(self.directory)
+            self._segments.append(segment)
+
+            if new_terms:
+                self._append(self.vocab_path, "vocab", "".join(term + "\n" for term in new_terms).encode())
+            rows = "".join(f"{chunk_id}\t{document_id or ''}\n" for chunk_id, document_id in zip(chunk_ids, document_ids))
+            self._append(self.chunks_path, "chunks", rows.encode())
+            self._append(self.lengths_path, "lengths", self._lengths[first:first + len(chunk_ids)].tobytes())
+
+            obsolete = self._merge()
+            self._write_manifest()
+            self._remove(obsolete)
+
+    def _merge(self) -> List[str]:
+        """Merge trailing segments while the newer is at least half the older's size, dropping deleted chunks"""
+        obsolete = []
+        while len(self._segments) >= 2 and len(self._segments[-2]) <= 2 * len(self._segments[-1]):
+            older, newer = self._segments[-2], self._segments.pop()
+            parts = [older.triples(), newer.triples()]
+            term_ids, docs, tfs = (np.concatenate([part[i] for part in parts]) for i in range(3))
+            live = self._alive[docs]
+            merged = _Segment.build(f"seg-{self._next_segment:06d}.npz", term_ids[live], docs[live], tfs[live])
+            self._next_segment += 1
+            merged.save(self.directory)
+            self._segments[-1] = merged
+            obsolete += [older.name, newer.name]
+        return obsolete
+
+    def _remove(self, names: List[str]):
+        for name in names:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def delete_document(self, document_id: str) -> int:
+        """Drop every chunk of a document, returning how many were indexed"""
+        with self._lock, locks.file_lock(self.lock_path):
+            self._refresh()
+            indexes = self._by_document.pop(document_id, [])
+            if indexes:
+                self._tombstone(indexes)
+                self._write_manifest()
+            return len(indexes)
+
+    def clear(self):
+        with self._lock, locks.file_lock(self.lock_path):
+            self._refresh()
+            self._clear()
+
+    def _clear(self):
+        names = [segment.name for segment in self._segments]
+        self._reset_state()
+        self._write_manifest()
+        for path in (self.vocab_path, self.chunks_path, self.lengths_path, self.deleted_path):
+            open(path, "wb").close()
+        self._remove(names)
+
+    def search(self, query: str, k: int = 10, document_ids: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """Top chunk ids by BM25 score for the query, optionally only from the given documents"""
+        with self._lock:
+            if self._stamp() != self._manifest_stamp:
+                with locks.file_lock(self.lock_path):
+                    self._refresh()
+            term_ids = np.unique([self._vocab[t] for t in tokenize(query) if t in self._vocab]).astype(np.uint32)
+            segments, lengths, alive = list(self._segments), self._lengths, self._alive
+            chunk_ids, live, live_length = self._chunk_ids, self._live, self._live_length
+            if document_ids is not None:
+                rows = [row for document_id in document_ids for row in self._by_document.get(document_id, ())]
+                # Scores stay relative to the whole corpus; the scope only masks which chunks are returned
+                alive = np.zeros(len(alive), dtype=bool)
+                alive[rows] = self._alive[rows]
+        if not len(term_ids) or not live:
+            return []
+
+        # Document frequencies include deleted chunks until their segment is merged, a small overestimate
+        postings = [posting for segment in segments for posting in segment.lookup(term_ids)]
+        if not postings:
+            return []
+        frequencies: Dict[int, int] = {}
+        for term_id, docs, _ in postings:
+            frequencies[term_id] = frequencies.get(term_id, 0) + len(docs)
+
+        average_length = live_length / live
+        all_docs, all_scores = [], []
+        for term_id, docs, tfs in postings:
+            # Capped at the live count, or a term in nearly every chunk would score negative after deletions
+            df = min(frequencies[term_id], live)
+            idf = math.log(1 + (live - df + 0.5) / (df + 0.5))
+            tf = tfs.astype(np.float32)
+            norm = self.k1 * (1 - self.b + self.b * lengths[docs] / average_length)
+            all_docs.append(docs)
+            all_scores.append(idf * tf * (self.k1 + 1) / (tf + norm))
+
+        docs = np.concatenate(all_docs)
+        scores = np.concatenate(all_scores)
+        live_mask = alive[docs]
+        docs, scores = docs[live_mask], scores[live_mask]
+        if not len(docs):
+            return []
+
+        # Summing into a dense array is linear in postings, cheaper than sorting them by doc
+        totals = np.bincount(docs, weights=scores)
+        top = np.argpartition(-totals, min(k, len(totals)) - 1)[:k]
+        top = top[np.argsort(-totals[top])]
+        return [(chunk_ids[i], float(totals[i])) for i in top if totals[i] > 0]
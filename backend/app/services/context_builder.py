@@ -0,0 +1,169 @@
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import tiktoken
+
+# Per-message framing tokens added by chat formats
+MESSAGE_OVERHEAD = 4
+
+SUMMARY_HEADER = "Summary of earlier conversation:"
+
+@dataclass
+class PromptContext:
+    input: str
+    context: str
+    history: List[BaseMessage]
+    token_counts: Dict[str, int] = field(default_factory=dict)
+
+class ContextBuilder:
+    """Assembles retrieved context and chat history within a prompt token budget"""
+
+    def __init__(
+        self,
+        max_tokens: int = 6000,
+        context_share: float = 0.6,
+        max_history_messages: int = 20,
+        summary_tokens: int = 300,
+        encoding_name: str = "cl100k_base"
+    ):
+        self.max_tokens = max_tokens
+        self.context_share = context_share
+        self.max_history_messages = max_history_messages
+        self.summary_tokens = summary_tokens
+        self.encoding_name = encoding_name
+        self._encoding = None
+        self._encoding_loaded = False
+
+    @property
+    def encoding(self):
+        # Loaded on first use, since tiktoken may have to download its BPE files
+        if not self._encoding_loaded:
+            try:
+                self._encoding = tiktoken.get_encoding(self.encoding_name)
+            except Exception as e:
+                # Without the BPE files fall back to the ~4 characters per token rule of thumb
+                print(f"Tokenizer unavailable, approximating token counts: {e}")
+                self._encoding = None
+            self._encoding_loaded = True
+        return self._encoding
+
+    def count(self, text: str) -> int:
+        if self.encoding is None:
+            return (len(text) + 3) // 4
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut text to at most max_tokens tokens"""
+        if max_tokens <= 0:
+            return ""
+        if self.encoding is None:
+            return text if len(text) <= max_tokens * 4 else text[:max_tokens * 4] + "..."
+        tokens = self.encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return self.encoding.decode(tokens[:max_tokens]) + "..."
+
+    def _format_context(self, rag_context: List[Dict], web_context: List[Dict], budget: int) -> str:
+        sections = []
+        if rag_context:
+            sections.append(("=== Document Context ===", [
+                f"[Doc {i}] {doc.get('source', 'Unknown')}: {doc.get('content', '')}"
+                for i, doc in enumerate(rag_context, 1)
+            ]))
+        if web_context:
+            sections.append(("\n=== Web Search Results ===", [
+                f"[Web {i}] {result.get('title', 'Unknown')}: {result.get('snippet', '')}"
+                for i, result in enumerate(web_context, 1)
+            ]))
+
+        context_parts = []
+        remaining = budget
+        for header, items in sections:
+            # Results are ranked, so later items are truncated or dropped first
+            remaining -= self.count(header)
+            if remaining <= 0:
+                break
+            context_parts.append(header)
+            for item in items:
+                item = self.truncate(item, remaining)
+                if not item:
+                    break
+                context_parts.append(item)
+                remaining -= self.count(item)
+
+        return "\n".join(context_parts)
+
+    def summarize(self, turns: List[Dict], max_tokens: int, previous: Optional[str] = None) -> str:
+        """Cheap extractive summary of older turns: the opening of each, oldest first, after any previous summary"""
+        lines = previous.splitlines()[1:] if previous else []
+        if turns:
+            # Only the most recent dropped turns can fit at a useful length
+            turns = turns[-max(1, max_tokens // 16):]
+            per_turn = max(16, max_tokens // len(turns))
+            lines += [
+                f"- {'User' if turn['role'] == 'user' else 'Assistant'}: {self.truncate(' '.join(turn['content'].split()), per_turn)}"
+                for turn in turns
+            ]
+
+        # Oldest lines give way first when the summary outgrows its budget
+        while len(lines) > 1 and self.count("\n".join([SUMMARY_HEADER] + lines)) > max_tokens:
+            lines.pop(0)
+        return self.truncate("\n".join([SUMMARY_HEADER] + lines), max_tokens)
+
+    def build(
+        self,
+        system_prompt: str,
+        message: str,
+        chat_history: Optional[List[Dict]] = None,
+        rag_context: Optional[List[Dict]] = None,
+        web_context: Optional[List[Dict]] = None,
+        history_summary: Optional[str] = None
+    ) -> PromptContext:
+        chat_history = chat_history or []
+        system_tokens = self.count(system_prompt) + MESSAGE_OVERHEAD
+        input_tokens = self.count(message) + MESSAGE_OVERHEAD
+        available = max(0, self.max_tokens - system_tokens - input_tokens)
+
+        context = self._format_context(rag_context or [], web_context or [], int(available * self.context_share))
+        context_tokens = self.count(context) if context else 0
+
+        # History gets everything the context did not use, newest turns first
+        history_budget = available - context_tokens
+        recent = chat_history[-self.max_history_messages:]
+        kept = []
+        used = 0
+        for turn in reversed(recent):
+            cost = self.count(turn["content"]) + MESSAGE_OVERHEAD
+            if used + cost > history_budget:
+                break
+            kept.append(turn)
+            used += cost
+        kept.reverse()
+
+        history: List[BaseMessage] = [
+            HumanMessage(content=turn["content"]) if turn["role"] == "user" else AIMessage(content=turn["content"])
+            for turn in kept
+        ]
+
+        dropped = chat_history[:len(chat_history) - len(kept)]
+        summary_tokens = 0
+        if dropped or history_summary:
+            # Make room for the summary by dropping the oldest kept turns if needed
+            summary_budget = min(self.summary_tokens, history_budget)
+            while history and used + summary_budget > history_budget:
+                used -= self.count(history.pop(0).content) + MESSAGE_OVERHEAD
+                dropped = chat_history[:len(chat_history) - len(history)]
+            if summary_budget > MESSAGE_OVERHEAD:
+                summary = self.summarize(dropped, summary_budget - MESSAGE_OVERHEAD, previous=history_summary)
+                history.insert(0, SystemMessage(content=summary))
+                summary_tokens = self.count(summary) + MESSAGE_OVERHEAD
+
+        token_counts = {
+            "system": system_tokens,
+            "context": context_tokens,
+            "history": used + summary_tokens,
+            "input": input_tokens
+        }
+        token_counts["total"] = sum(token_counts.values())
+
+        return PromptContext(input=message, context=context, history=history, token_counts=token_counts)
\ No newline at end of file
@@ -0,0 +1,92 @@
+from app.utils.metrics import EMBEDDING_BATCH_SIZE, EMBEDDING_QUEUE_SECONDS
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import asyncio
+import time
+
+class EmbeddingBatcher:
+    """Coalesces concurrent single-text embeddings into batched calls"""
+
+    def __init__(
+        self,
+        embed_batch: Callable[[List[str]], Awaitable[List[List[float]]]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0
+    ):
+        self.embed_batch = embed_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._pending: List[Tuple[str, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._inflight: Set[asyncio.Task] = set()
+
+        # Metrics
+        self.batches = 0
+        self.requests = 0
+        self.max_batch = 0
+        self.batch_sizes: Dict[int, int] = {}
+        self.total_queue_delay = 0.0
+        self.max_queue_delay = 0.0
+
+    async def embed(self, text: str) -> List[float]:
+        """Embed one text, sharing a batch with any calls arriving in the same window"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future, float]]):
+        now = time.perf_counter()
+        for _, _, queued_at in batch:
+            delay = now - queued_at
+            self.total_queue_delay += delay
+            self.max_queue_delay = max(self.max_queue_delay, delay)
+            EMBEDDING_QUEUE_SECONDS.observe(delay)
+
+        # Identical texts in the same window are embedded once
+        texts = list(dict.fromkeys(text for text, _, _ in batch))
+        self.batches += 1
+        self.requests += len(batch)
+        self.max_batch = max(self.max_batch, len(texts))
+        self.batch_sizes[len(texts)] = self.batch_sizes.get(len(texts), 0) + 1
+        EMBEDDING_BATCH_SIZE.observe(len(texts))
+
+        try:
+            vectors = dict(zip(texts, await self.embed_batch(texts)))
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for text, future, _ in batch:
+            if not future.done():
+                future.set_result(vectors[text])
+
+    def stats(self) -> Dict:
+        """Batch size and queueing delay metrics"""
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            "mean_queue_delay_ms": self.total_queue_delay / self.requests * 1000 if self.requests else 0.0,
+            "max_queue_delay_ms": self.max_queue_delay * 1000
+        }
\ No newline at end of file
@@ -0,0 +1,113 @@
+from app.utils.locks import file_lock
+from typing import Dict, List, Optional
+import json
+import numpy as np
+import os
+import re
+import threading
+
+DIGEST_SIZE = 32
+
+class EmbeddingStore:
+    """Append-only on-disk cache of chunk embeddings for one embedding model.
+
+    Rows live in a flat float32 file that is memory-mapped for reads, with a
+    parallel file of raw SHA-256 digests giving each row's chunk hash. Several
+    processes may share a directory: appends hold an exclusive file lock and
+    first pick up rows other processes added.
+    """
+
+    def __init__(self, directory: str, model_name: str):
+        self.model_name = model_name
+        self.directory = os.path.join(directory, re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name))
+        self.keys_path = os.path.join(self.directory, "keys.bin")
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+        self.meta_path = os.path.join(self.directory, "meta.json")
+        self.lock_path = os.path.join(self.directory, "lock")
+
+        self.dim: Optional[int] = None
+        self._index: Dict[bytes, int] = {}
+        self._vectors: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+
+        os.makedirs(self.directory, exist_ok=True)
+        with file_lock(self.lock_path, exclusive=False):
+            self._refresh()
+
+    def _stored_rows(self) -> int:
+        """Complete rows on disk; rows are appended vectors-first, so a crash can only leave extra vector bytes"""
+        if self.dim is None or not os.path.exists(self.keys_path) or not os.path.exists(self.vectors_path):
+            return 0
+        return min(os.path.getsize(self.keys_path) // DIGEST_SIZE, os.path.getsize(self.vectors_path) // (4 * self.dim))
+
+    def _refresh(self):
+        """Index rows appended since the last refresh, by this or another process; call holding the file lock"""
+        if self.dim is None:
+            if not os.path.exists(self.meta_path):
+                return
+            with open(self.meta_path) as f:
+                self.dim = json.load(f)["dim"]
+
+        known, rows = len(self._index), self._stored_rows()
+        if rows <= known:
+            return
+        with open(self.keys_path, "rb") as f:
+            f.seek(known * DIGEST_SIZE)
+            keys = f.read((rows - known) * DIGEST_SIZE)
+        for i in range(rows - known):
+            self._index.setdefault(keys[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE], known + i)
+        self._remap(rows)
+
+    def _remap(self, rows: int):
+        self._vectors = (
+            np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+            if rows else None
+        )
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def get_many(self, chunk_hashes: List[str]) -> Dict[str, List[float]]:
+        """Cached embeddings for whichever of the given hex chunk hashes are present"""
+        with self._lock:
+            if any(bytes.fromhex(chunk_hash) not in self._index for chunk_hash in chunk_hashes):
+                # Another process may have embedded them since
+                with file_lock(self.lock_path, exclusive=False):
+                    self._refresh()
+            found = {}
+            for chunk_hash in chunk_hashes:
+                row = self._index.get(bytes.fromhex(chunk_hash))
+                if row is not None:
+                    found[chunk_hash] = self._vectors[row].tolist()
+            return found
+
+    def put_many(self, embeddings: Dict[str, List[float]]):
+        """Append embeddings for chunk hashes not already cached"""
+        with self._lock, file_lock(self.lock_path):
+            # Rows other processes appended decide both what is new and where new rows go
+            self._refresh()
+            new = {
+                bytes.fromhex(chunk_hash): vector
+                for chunk_hash, vector in embeddings.items()
+                if bytes.fromhex(chunk_hash) not in self._index
+            }
+            if not new:
+                return
+
+            if self.dim is None:
+                self.dim = len(next(iter(new.values())))
+                with open(self.meta_path, "w") as f:
+                    json.dump({"model": self.model_name, "dim": self.dim}, f)
+
+            # Truncating only drops a partial row left by a writer that crashed
+            rows = self._stored_rows()
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(rows * 4 * self.dim)
+                f.write(np.asarray(list(new.values()), dtype=np.float32).tobytes())
+            with open(self.keys_path, "ab") as f:
+                f.truncate(rows * DIGEST_SIZE)
+                f.write(b"".join(new.keys()))
+
+            for i, key in enumerate(new):
+                self._index[key] = rows + i
+            self._remap(rows + len(new))
\ No newline at end of file
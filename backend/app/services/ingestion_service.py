@@ -0,0 +1,175 @@
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import select, update
+from app.config import settings
+from app.database import async_session
+from app.models import Document
+from app.services.rag_service import rag_service
+from app.utils.document_processor import iter_document_text
+from app.utils.metrics import INGESTION_CHUNKS, INGESTION_PAGES, INGESTION_PAGES_PER_SECOND, INGESTION_SECONDS
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Set
+import asyncio
+import os
+import time
+
+class IngestionService:
+    """Worker pool draining pending documents, with the documents table as the durable queue"""
+
+    def __init__(self, workers: int = settings.ingestion_workers):
+        self.workers = max(1, workers)
+        self.queue: Optional[asyncio.Queue] = None
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.progress: Dict[str, Dict[str, int]] = {}
+        # Documents interrupted mid-embedding, whose partial vectors are dropped before they are reprocessed
+        self._resumed: Set[str] = set()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingestion")
+        await self._resume()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def enqueue(self, document_id: str):
+        """Queue a pending document for processing"""
+        await self.queue.put(document_id)
+
+    def get_progress(self, document_id: str) -> Optional[Dict[str, int]]:
+        """Live progress of a document currently being processed"""
+        return self.progress.get(document_id)
+
+    async def _resume(self):
+        """Re-queue documents that were pending or in flight at shutdown"""
+        async with async_session() as db:
+            await db.execute(
+                update(Document)
+                .where(Document.processed == True, Document.status != "completed")
+                .values(status="completed")
+            )
+            result = await db.execute(
+                select(Document)
+                .where(
+                    Document.processed == False,
+                    Document.status.in_(["pending", "processing"])
+                )
+                .order_by(Document.uploaded_at)
+            )
+            documents = result.scalars().all()
+            for document in documents:
+                document.status = "pending"
+                document.pages_parsed = 0
+                document.chunks_embedded = 0
+            await db.commit()
+
+        for document in documents:
+            self._resumed.add(document.id)
+            await self.queue.put(document.id)
+
+    async def _iter_segments(self, segments: Iterator[str]) -> AsyncIterator[str]:
+        """Pull text from a blocking extraction generator on the worker pool"""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                segment = await loop.run_in_executor(self.executor, next, segments, None)
+                if segment is None:
+                    return
+                yield segment
+        finally:
+            await loop.run_in_executor(self.executor, segments.close)
+
+    async def _worker(self):
+        while True:
+            document_id = await self.queue.get()
+            try:
+                await self._process(document_id)
+            except Exception as e:
+                print(f"Ingestion error: {e}")
+            finally:
+                self.progress.pop(document_id, None)
+                self.queue.task_done()
+
+    async def _delete_vectors(self, document_id: str):
+        try:
+            await rag_service.delete_document(document_id)
+        except Exception as e:
+            print(f"Error deleting vectors of document {document_id}: {e}")
+
+    async def _process(self, document_id: str):
+        async with async_session() as db:
+            document = await db.get(Document, document_id)
+            if not document or document.processed:
+                return
+
+            file_path = document.file_path
+            document.status = "processing"
+            await db.commit()
+
+            progress = {"page_count": 0, "pages_parsed": 0, "chunks_embedded": 0}
+            self.progress[document_id] = progress
+            started = time.perf_counter()
+
+            def on_page(pages_parsed: int, page_count: int):
+                progress["pages_parsed"] = pages_parsed
+                progress["page_count"] = page_count
+
+            def on_chunks(chunks_embedded: int):
+                progress["chunks_embedded"] = chunks_embedded
+
+            try:
+                if document_id in self._resumed:
+                    # Drop vectors from a partially embedded previous attempt, off the startup path
+                    await rag_service.delete_document(document_id)
+                    self._resumed.discard(document_id)
+                segments = iter_document_text(file_path, document.file_type, on_page)
+                chunk_count = await rag_service.add_document_stream(
+                    self._iter_segments(segments),
+                    metadata={
+                        "document_id": document.id,
+                        "filename": document.filename,
+                        "file_type": document.file_type
+                    },
+                    on_progress=on_chunks
+                )
+
+                # The document may have been deleted while it was being embedded
+                if not await db.scalar(select(Document.id).where(Document.id == document_id)):
+                    await self._delete_vectors(document_id)
+                    return
+
+                document.page_count = progress["page_count"]
+                document.pages_parsed = progress["pages_parsed"]
+                document.chunk_count = chunk_count
+                document.chunks_embedded = chunk_count
+                document.processed = True
+                document.status = "completed"
+                await db.commit()
+                
+                elapsed = time.perf_counter() - started
+                INGESTION_SECONDS.observe(elapsed, status="completed")
+                INGESTION_PAGES.inc(progress["pages_parsed"])
+                INGESTION_CHUNKS.inc(chunk_count)
+                if progress["pages_parsed"] and elapsed > 0:
+                    INGESTION_PAGES_PER_SECOND.observe(progress["pages_parsed"] / elapsed)
+
+            except Exception as e:
+                INGESTION_SECONDS.observe(time.perf_counter() - started, status="failed")
+                await db.rollback()
+                await self._delete_vectors(document_id)
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                await db.execute(
+                    update(Document)
+                    .where(Document.id == document_id)
+                    .values(status="failed", error=str(e))
+                )
+                await db.commit()
+
+ingestion_service = IngestionService()
\ No newline at end of file
@@ -1,29 +1,19 @@
 from langchain_groq import ChatGroq
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from langchain_core.messages import HumanMessage
 from langchain_core.output_parsers import StrOutputParser
 from app.config import settings
+from app.services.context_builder import ContextBuilder, PromptContext
 from typing import AsyncGenerator, List, Dict
+import asyncio
 import json
 
 class LLMService:
     def __init__(self):
-        # Use Groq for fast responses (free tier available)
-        if settings.groq_api_key:
-            self.llm = ChatGroq(
-                api_key=settings.groq_api_key,
-                model_name="llama-3.1-8b-instant",
-                temperature=0.7,
-                streaming=True
-            )
-        else:
-            self.llm = ChatOpenAI(
-                api_key=settings.openai_api_key,
-                model="gpt-3.5-turbo",
-                temperature=0.7,
-                streaming=True
-            )
+        # The client is built on first use, so importing the app needs no API key
+        self._llm = None
+        self._chain = None
         
         self.system_prompt = """You are a helpful AI assistant. You provide accurate, helpful, and friendly responses.
 
@@ -32,81 +22,96 @@ Always cite your sources when using external information.
 
 If you don't know something, say so honestly. Be concise but thorough."""
 
-    def _format_context(self, rag_context: List[Dict] = None, web_context: List[Dict] = None) -> str:
-        context_parts = []
-        
-        if rag_context:
-            context_parts.append("=== Document Context ===")
-            for i, doc in enumerate(rag_context, 1):
-                context_parts.append(f"[Doc {i}] {doc.get('source', 'Unknown')}: {doc.get('content', '')}")
-        
-        if web_context:
-            context_parts.append("\n=== Web Search Results ===")
-            for i, result in enumerate(web_context, 1):
-                context_parts.append(f"[Web {i}] {result.get('title', 'Unknown')}: {result.get('snippet', '')}")
-        
-        return "\n".join(context_parts)
-
-    def _format_messages(self, chat_history: List[Dict]) -> List:
-        messages = []
-        for msg in chat_history[-10:]:  # Keep last 10 messages for context
-            if msg["role"] == "user":
-                messages.append(HumanMessage(content=msg["content"]))
-            else:
-                messages.append(AIMessage(content=msg["content"]))
-        return messages
-
-    async def generate_response(
-        self,
-        message: str,
-        chat_history: List[Dict] = None,
-        rag_context: List[Dict] = None,
-        web_context: List[Dict] = None
-    ) -> str:
-        context = self._format_context(rag_context, web_context)
-        
-        prompt_template = ChatPromptTemplate.from_messages([
-            ("system", self.system_prompt + ("\n\nContext:\n" + context if context else "")),
+        # Compiled once; context is passed as a variable so it is never parsed as a template
+        self.prompt_template = ChatPromptTemplate.from_messages([
+            ("system", "{system_prompt}{context}"),
             MessagesPlaceholder(variable_name="chat_history"),
             ("human", "{input}")
         ])
-        
-        chain = prompt_template | self.llm | StrOutputParser()
-        
-        history = self._format_messages(chat_history or [])
-        
-        response = await chain.ainvoke({
-            "input": message,
-            "chat_history": history
-        })
-        
-        return response
 
-    async def generate_stream(
+        self.context_builder = ContextBuilder(
+            max_tokens=settings.prompt_token_budget,
+            context_share=settings.context_token_share,
+            max_history_messages=settings.history_max_messages,
+            summary_tokens=settings.history_summary_tokens
+        )
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            # Use Groq for fast responses (free tier available)
+            if settings.groq_api_key:
+                self._llm = ChatGroq(
+                    api_key=settings.groq_api_key,
+                    model_name="llama-3.1-8b-instant",
+                    temperature=0.7,
+                    streaming=True
+                )
+            else:
+                self._llm = ChatOpenAI(
+                    api_key=settings.openai_api_key,
+                    model="gpt-3.5-turbo",
+                    temperature=0.7,
+                    streaming=True
+                )
+        return self._llm
+
+    @llm.setter
+    def llm(self, llm):
+        self._llm = llm
+        self._chain = None
+
+    @property
+    def chain(self):
+        if self._chain is None:
+            self._chain = self.prompt_template | self.llm | StrOutputParser()
+        return self._chain
+
+    def build_prompt(
         self,
         message: str,
         chat_history: List[Dict] = None,
         rag_context: List[Dict] = None,
-        web_context: List[Dict] = None
-    ) -> AsyncGenerator[str, None]:
-        context = self._format_context(rag_context, web_context)
-        
-        prompt_template = ChatPromptTemplate.from_messages([
-            ("system", self.system_prompt + ("\n\nContext:\n" + context if context else "")),
-            MessagesPlaceholder(variable_name="chat_history"),
-            ("human", "{input}")
-        ])
-        
-        chain = prompt_template | self.llm
-        
-        history = self._format_messages(chat_history or [])
-        
-        async for chunk in chain.astream({
-            "input": message,
-            "chat_history": history
-        }):
-            if hasattr(chunk, 'content'):
-                yield chunk.content
+        web_context: List[Dict] = None,
+        history_summary: str = None
+    ) -> PromptContext:
+        """Fit context and history into the prompt token budget"""
+        return self.context_builder.build(
+            self.system_prompt,
+            message,
+            chat_history=chat_history,
+            rag_context=rag_context,
+            web_context=web_context,
+            history_summary=history_summary
+        )
+
+    def extend_summary(self, previous: str, turns: List[Dict]) -> str:
+        """Fold turns that left the history window into a thread's rolling summary"""
+        return self.context_builder.summarize(turns, self.context_builder.summary_tokens, previous=previous)
+
+    def _chain_inputs(self, prompt: PromptContext) -> Dict:
+        return {
+            "system_prompt": self.system_prompt,
+            "context": "\n\nContext:\n" + prompt.context if prompt.context else "",
+            "chat_history": prompt.history,
+            "input": prompt.input
+        }
+
+    async def generate_response(self, prompt: PromptContext) -> str:
+        return await self.chain.ainvoke(self._chain_inputs(prompt))
+
+    async def generate_stream(self, prompt: PromptContext) -> AsyncGenerator[str, None]:
+        async for chunk in self.chain.astream(self._chain_inputs(prompt)):
+            yield chunk
+
+    async def warmup(self):
+        """Load the tokenizer off the event loop"""
+        await asyncio.to_thread(self.context_builder.count, "warmup")
+
+    def fallback_title(self, first_message: str) -> str:
+        """Title from the opening words of the message, used when the LLM is slow or unavailable"""
+        title = " ".join(first_message.split()[:6]).strip(" .,:;!?")
+        return (title[:1].upper() + title[1:])[:50] or "New Conversation"
 
     async def generate_title(self, first_message: str) -> str:
         prompt = f"Generate a short, concise title (max 5 words) for a conversation that starts with: '{first_message}'. Return only the title, no quotes or extra text."
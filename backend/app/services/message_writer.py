@@ -0,0 +1,131 @@
+from sqlalchemy import insert, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from typing import Dict, List, Optional, Set, Tuple
+import asyncio
+from app.config import settings
+from app.database import async_session
+from app.models import Message, generate_uuid
+
+class MessageWriter:
+    """Coalesces message inserts and updates from concurrent chat requests into short batched transactions"""
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 10.0
+    ):
+        self.session_factory = session_factory
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._pending: List[Tuple[str, Dict, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._inflight: Set[asyncio.Task] = set()
+
+        # Metrics
+        self.batches = 0
+        self.writes = 0
+
+    async def add(self, **values) -> str:
+        """Insert a message, returning its id once the batch holding it is committed"""
+        values.setdefault("id", generate_uuid())
+        await self._submit("insert", values)
+        return values["id"]
+
+    async def update(self, message_id: str, **values):
+        """Update a message's columns, e.g. to checkpoint a streaming response"""
+        await self._submit("update", {"id": message_id, **values})
+
+    async def _submit(self, kind: str, values: Dict):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((kind, values, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _run(self, batch: List[Tuple[str, Dict, asyncio.Future]]):
+        self.batches += 1
+        self.writes += len(batch)
+
+        try:
+            await self._write(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                self._settle(batch, e)
+                return
+            # One bad row would otherwise fail every request in the window, so retry each on its own
+            for entry in batch:
+                try:
+                    await self._write([entry])
+                except Exception as e:
+                    self._settle([entry], e)
+                else:
+                    self._settle([entry])
+            return
+
+        self._settle(batch)
+
+    async def _write(self, batch: List[Tuple[str, Dict, asyncio.Future]]):
+        inserts = [values for kind, values, _ in batch if kind == "insert"]
+        # Only the latest update to each message in the window needs writing
+        updates: Dict[Tuple, Dict[str, Dict]] = {}
+        for kind, values, _ in batch:
+            if kind == "update":
+                updates.setdefault(tuple(sorted(values)), {})[values["id"]] = values
+
+        async with self.session_factory() as db:
+            if inserts:
+                await db.execute(insert(Message), inserts)
+            for rows in updates.values():
+                await db.execute(update(Message), list(rows.values()))
+            await db.commit()
+
+    def _settle(self, batch: List[Tuple[str, Dict, asyncio.Future]], error: Optional[Exception] = None):
+        for _, _, future in batch:
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(None)
+            else:
+                future.set_exception(error)
+
+    async def abort_interrupted(self):
+        """Mark responses left streaming by a previous process as aborted"""
+        async with self.session_factory() as db:
+            await db.execute(update(Message).where(Message.status == "streaming").values(status="aborted"))
+            await db.commit()
+
+    async def drain(self):
+        """Write anything still queued, for shutdown"""
+        self._flush()
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+    def stats(self) -> Dict:
+        return {
+            "batches": self.batches,
+            "writes": self.writes,
+            "mean_batch_size": self.writes / self.batches if self.batches else 0.0
+        }
+
+message_writer = MessageWriter(
+    async_session,
+    max_batch_size=settings.message_write_batch_size,
+    max_wait_ms=settings.message_write_wait_ms
+)
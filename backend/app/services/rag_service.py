@@ -2,84 +2,678 @@ from langchain_community.vectorstores import Chroma
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_core.documents import Document
 from app.config import settings
-from typing import List, Dict
+from app.services.bm25_index import BM25Index
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.embedding_store import EmbeddingStore
+from app.services.reranker import Reranker
+from app.utils.cache import TTLCache
+from app.utils.executors import embedding_executor, rerank_executor, vectorstore_executor
+from app.utils.metrics import EMBEDDING_SECONDS, RERANK_SKIPPED, RETRIEVAL_SECONDS
+from typing import AsyncIterator, Callable, Collection, List, Dict, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import numpy as np
 import os
+import threading
+import time
+import uuid
+
+EMBEDDING_BATCH_SIZE = 64
+# Seconds before a failed warmup is retried, doubling per consecutive failure up to the maximum
+WARMUP_RETRY_DELAY = 1.0
+WARMUP_RETRY_MAX_DELAY = 60.0
+# Streamed text is split once this much has accumulated
+STREAM_BUFFER_CHARS = 32_000
+# Chunking the index was built with, next to the collection
+CHUNKING_FILE = "chunking.json"
 
 class RAGService:
     def __init__(self):
+        # The embedding model, stores and Chroma load on first use or in warmup(), never at import
+        self._embeddings = None
+        self.embedding_model_name: Optional[str] = None
+        self._embedding_store: Optional[EmbeddingStore] = None
+        self._vectorstore = None
+        self._vectorstore_opened = False
+        self._keyword_index: Optional[BM25Index] = None
+        self._keyword_index_opened = False
+        self._load_lock = threading.RLock()
+        self._warmup_task: Optional[asyncio.Future] = None
+        self._warmup_failures = 0
+        self._warmup_retry_at = 0.0
+        self.startup_timings: Dict[str, float] = {}
+        
+        self.set_chunking(settings.chunk_size, settings.chunk_overlap)
+        
+        # Embedding, Chroma and reranker calls block, so they run on dedicated pools
+        self.embedding_executor = embedding_executor
+        self.vectorstore_executor = vectorstore_executor
+        self.rerank_executor = rerank_executor
+        self.reranker = Reranker(settings.rerank_model, settings.rerank_batch_size)
+        # Reranks still running on the pool, including ones whose caller gave up waiting
+        self._reranks_running = 0
+        
+        # Concurrent search queries share embedding batches
+        self.query_batcher = EmbeddingBatcher(
+            self._embed_batch,
+            max_batch_size=settings.embedding_batch_size,
+            max_wait_ms=settings.embedding_batch_wait_ms
+        )
+        
+        # Normalized query -> embedding, and (normalized query, k, rerank, scope, collection version) -> results
+        self.embedding_cache = TTLCache(settings.query_cache_size, settings.query_cache_ttl)
+        self.result_cache = TTLCache(settings.retrieval_cache_size, settings.retrieval_cache_ttl)
+        # Document id -> its chunks and vectors, so scoped searches skip Chroma's slow metadata filter;
+        # bounded by total chunks, and document id -> chunk count for every document read this way
+        self.document_chunks = TTLCache(settings.scoped_search_cache_chunks, weigh=lambda chunks: max(1, len(chunks["ids"])))
+        self.document_sizes: Dict[str, int] = {}
+        self.collection_version = 0
+    
+    @property
+    def embeddings(self):
+        if self._embeddings is None:
+            with self._load_lock:
+                if self._embeddings is None:
+                    self._load_embeddings()
+        return self._embeddings
+    
+    @embeddings.setter
+    def embeddings(self, embeddings):
+        self._embeddings = embeddings
+    
+    def _load_embeddings(self):
         # Use HuggingFace embeddings (free) or OpenAI
         try:
-            self.embeddings = HuggingFaceEmbeddings(
+            self._embeddings = HuggingFaceEmbeddings(
                 model_name="sentence-transformers/all-MiniLM-L6-v2"
             )
+            self.embedding_model_name = self._embeddings.model_name
         except:
-            self.embeddings = OpenAIEmbeddings(api_key=settings.openai_api_key)
-        
+            self._embeddings = OpenAIEmbeddings(api_key=settings.openai_api_key)
+            self.embedding_model_name = self._embeddings.model
+    
+    @property
+    def embedding_store(self) -> EmbeddingStore:
+        # Chunk embeddings survive re-indexing and collection resets on disk
+        if self._embedding_store is None:
+            with self._load_lock:
+                if self._embedding_store is None:
+                    embeddings = self.embeddings
+                    self._embedding_store = EmbeddingStore(
+                        os.path.join(settings.chroma_persist_dir, "embedding_cache"),
+                        self.embedding_model_name or type(embeddings).__name__
+                    )
+        return self._embedding_store
+    
+    @embedding_store.setter
+    def embedding_store(self, embedding_store: EmbeddingStore):
+        self._embedding_store = embedding_store
+    
+    @property
+    def vectorstore(self):
+        if not self._vectorstore_opened:
+            with self._load_lock:
+                if not self._vectorstore_opened:
+                    self._init_vectorstore()
+        return self._vectorstore
+    
+    @property
+    def keyword_index(self) -> Optional[BM25Index]:
+        # Keyword index for exact identifiers, codes and names that embeddings miss
+        if not self._keyword_index_opened:
+            with self._load_lock:
+                if not self._keyword_index_opened:
+                    if settings.hybrid_search:
+                        self._keyword_index = BM25Index(os.path.join(settings.chroma_persist_dir, "bm25"))
+                    self._keyword_index_opened = True
+        return self._keyword_index
+    
+    def _load(self):
+        for name, load in (
+            ("embedding_model", lambda: self.embeddings.embed_query("warmup")),
+            ("embedding_cache", lambda: self.embedding_store),
+            ("vectorstore", lambda: self.vectorstore),
+            ("keyword_index", lambda: self.keyword_index),
+            ("reranker", lambda: self.reranker.load() if settings.rerank_enabled else None),
+            ("chunking", self._load_chunking)
+        ):
+            started = time.perf_counter()
+            load()
+            self.startup_timings[f"{name}_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    
+    def _warmup_done(self, task: asyncio.Future):
+        if task.cancelled():
+            return
+        if task.exception() is None:
+            self._warmup_failures = 0
+            return
+        self._warmup_failures += 1
+        delay = min(WARMUP_RETRY_DELAY * 2 ** (self._warmup_failures - 1), WARMUP_RETRY_MAX_DELAY)
+        self._warmup_retry_at = time.monotonic() + delay
+    
+    async def warmup(self) -> Dict[str, float]:
+        """Load the embedding model, stores and Chroma off the event loop, once; a failed load is retried with backoff"""
+        task = self._warmup_task
+        if task is not None and task.done():
+            if task.cancelled():
+                task = None
+            elif task.exception() is not None:
+                # Until the backoff passes, callers get the last error instead of another full load
+                if time.monotonic() < self._warmup_retry_at:
+                    raise task.exception()
+                task = None
+        if task is None:
+            task = self._warmup_task = asyncio.ensure_future(self.vectorstore_executor.run(self._load))
+            task.add_done_callback(self._warmup_done)
+        await asyncio.shield(task)
+        return self.startup_timings
+    
+    def set_chunking(self, chunk_size: int, chunk_overlap: int):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
         self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
             length_function=len
         )
-        
-        self.vectorstore = None
-        self._init_vectorstore()
+    
+    def _load_chunking(self):
+        """Split new uploads the way the index was built, so changing CHUNK_SIZE alone never mixes chunk sizes"""
+        path = os.path.join(settings.chroma_persist_dir, CHUNKING_FILE)
+        if not os.path.exists(path):
+            self.save_chunking()
+            return
+        with open(path) as f:
+            chunking = json.load(f)
+        if (chunking["chunk_size"], chunking["chunk_overlap"]) != (settings.chunk_size, settings.chunk_overlap):
+            print(
+                f"Index was built with chunk_size={chunking['chunk_size']}, chunk_overlap={chunking['chunk_overlap']}; "
+                f"run `python -m app.cli reindex` to apply CHUNK_SIZE and CHUNK_OVERLAP"
+            )
+        self.set_chunking(chunking["chunk_size"], chunking["chunk_overlap"])
+    
+    def save_chunking(self):
+        """Record the current chunking as the one the index is built with"""
+        os.makedirs(settings.chroma_persist_dir, exist_ok=True)
+        path = os.path.join(settings.chroma_persist_dir, CHUNKING_FILE)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"chunk_size": self.chunk_size, "chunk_overlap": self.chunk_overlap}, f)
+        os.replace(path + ".tmp", path)
     
     def _init_vectorstore(self):
+        self._vectorstore_opened = True
         try:
-            self.vectorstore = Chroma(
+            self._vectorstore = Chroma(
                 persist_directory=settings.chroma_persist_dir,
                 embedding_function=self.embeddings,
                 collection_name="documents"
             )
         except Exception as e:
+            self._vectorstore = None
             print(f"Error initializing vectorstore: {e}")
     
-    async def add_documents(self, text: str, metadata: Dict) -> int:
+    def _bump_version(self, document_id: Optional[str] = None):
+        """Invalidate cached retrieval results after the collection, or one document in it, changes"""
+        self.collection_version += 1
+        self.result_cache.clear()
+        if document_id is None:
+            self.document_chunks.clear()
+            self.document_sizes.clear()
+        else:
+            self.document_chunks.pop(document_id)
+            self.document_sizes.pop(document_id, None)
+    
+    async def embed_query(self, query: str) -> List[float]:
+        """Embed a search query, reusing cached vectors for repeated questions"""
+        key = " ".join(query.lower().split())
+        embedding = self.embedding_cache.get(key)
+        if embedding is None:
+            with EMBEDDING_SECONDS.time(operation="query"):
+                embedding = await self.query_batcher.embed(key)
+            self.embedding_cache.set(key, embedding)
+        return embedding
+    
+    def _embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with EMBEDDING_SECONDS.time(operation="batch"):
+            return self.embeddings.embed_documents(texts)
+    
+    async def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        return await self.embedding_executor.run(self._embed_documents, texts)
+    
+    def _stored_embeddings(self, chunk_hashes: List[str]) -> Dict[str, List[float]]:
+        """Embeddings already stored for any of the given chunk hashes"""
+        stored = self.vectorstore._collection.get(
+            where={"chunk_hash": {"$in": chunk_hashes}},
+            include=["embeddings", "metadatas"]
+        )
+        return {
+            meta["chunk_hash"]: list(embedding)
+            for meta, embedding in zip(stored["metadatas"], stored["embeddings"])
+        }
+    
+    async def _embed_chunks(self, chunks: List[str], chunk_hashes: List[str]) -> List[List[float]]:
+        """Embed chunks, reusing cached or stored embeddings of identical chunks"""
+        unique_hashes = list(dict.fromkeys(chunk_hashes))
+        vectors = await self.vectorstore_executor.run(self.embedding_store.get_many, unique_hashes)
+        
+        uncached = [h for h in unique_hashes if h not in vectors]
+        new_vectors = {}
+        if uncached:
+            new_vectors = await self.vectorstore_executor.run(self._stored_embeddings, uncached)
+        
+        missing = {h: chunk for h, chunk in zip(chunk_hashes, chunks) if h not in vectors and h not in new_vectors}
+        if missing:
+            embedded = await self._embed_batch(list(missing.values()))
+            new_vectors.update(zip(missing.keys(), embedded))
+        
+        if new_vectors:
+            await self.vectorstore_executor.run(self.embedding_store.put_many, new_vectors)
+            vectors.update(new_vectors)
+        
+        return [vectors[h] for h in chunk_hashes]
+    
+    def _add_batch(self, ids: List[str], chunks: List[str], metadatas: List[Dict], embeddings: List[List[float]]):
+        self.vectorstore._collection.upsert(
+            ids=ids,
+            embeddings=embeddings,
+            metadatas=metadatas,
+            documents=chunks
+        )
+    
+    async def add_document_stream(
+        self,
+        segments: AsyncIterator[str],
+        metadata: Dict,
+        on_progress: Optional[Callable[[int], None]] = None
+    ) -> int:
+        """Split, embed and store text as it arrives, reporting embedded chunk counts via on_progress"""
+        await self.warmup()
+        document_id = metadata.get("document_id") or str(uuid.uuid4())
+        buffer = ""
+        pending: List[str] = []
+        chunk_count = 0
+        
+        async def embed_pending(final: bool):
+            nonlocal pending, chunk_count
+            while len(pending) >= EMBEDDING_BATCH_SIZE or (final and pending):
+                batch, pending = pending[:EMBEDDING_BATCH_SIZE], pending[EMBEDDING_BATCH_SIZE:]
+                chunk_hashes = [hashlib.sha256(chunk.encode("utf-8")).hexdigest() for chunk in batch]
+                ids = [f"{document_id}:{chunk_count + i}" for i in range(len(batch))]
+                metadatas = [
+                    {**metadata, "chunk_index": chunk_count + i, "chunk_hash": chunk_hashes[i]}
+                    for i in range(len(batch))
+                ]
+                embeddings = await self._embed_chunks(batch, chunk_hashes)
+                await self.vectorstore_executor.run(self._add_batch, ids, batch, metadatas, embeddings)
+                if self.keyword_index is not None:
+                    await self.vectorstore_executor.run(
+                        self.keyword_index.add, ids, batch, [m.get("document_id", "") for m in metadatas]
+                    )
+                self._bump_version(document_id)
+                chunk_count += len(batch)
+                if on_progress:
+                    on_progress(chunk_count)
+        
+        async for segment in segments:
+            buffer += segment
+            if len(buffer) < STREAM_BUFFER_CHARS:
+                continue
+            
+            chunks = self.text_splitter.split_text(buffer)
+            # Carry the last chunk over so text spanning segments is split as one piece
+            buffer = chunks.pop() if chunks else ""
+            pending.extend(chunks)
+            await embed_pending(final=False)
+        
+        pending.extend(self.text_splitter.split_text(buffer))
+        await embed_pending(final=True)
+        
+        return chunk_count
+    
+    async def add_documents(
+        self,
+        text: str,
+        metadata: Dict,
+        on_progress: Optional[Callable[[int], None]] = None
+    ) -> int:
         """Add document chunks to the vector store"""
-        chunks = self.text_splitter.split_text(text)
+        async def single():
+            yield text
+        
+        return await self.add_document_stream(single(), metadata, on_progress)
+    
+    def _vector_hits(self, embedding: List[float], n: int, document_ids: Optional[Collection[str]] = None) -> List[Dict]:
+        """Nearest chunks by embedding, as dicts with id, content, metadata and distance"""
+        # Chroma applies the document filter before the nearest neighbour search, not to its results
+        where = {"document_id": {"$in": sorted(document_ids)}} if document_ids is not None else None
+        with RETRIEVAL_SECONDS.time(step="vector"):
+            result = self.vectorstore._collection.query(
+                query_embeddings=[embedding],
+                n_results=n,
+                where=where,
+                include=["documents", "metadatas", "distances"]
+            )
+        return [
+            {"id": chunk_id, "content": content, "metadata": metadata or {}, "distance": distance}
+            for chunk_id, content, metadata, distance in zip(
+                result["ids"][0], result["documents"][0], result["metadatas"][0], result["distances"][0]
+            )
+        ]
+    
+    def _read_document_chunks(self, document_ids: List[str]) -> Dict[str, Dict]:
+        """Chunk ids, text, metadata and vectors of each document, in one read from the collection"""
+        stored = self.vectorstore._collection.get(
+            where={"document_id": {"$in": document_ids}},
+            include=["embeddings", "documents", "metadatas"]
+        )
+        rows: Dict[str, List] = {document_id: [] for document_id in document_ids}
+        for row in zip(stored["ids"], stored["documents"], stored["metadatas"], stored["embeddings"]):
+            rows[row[2]["document_id"]].append(row)
+        
+        chunks = {}
+        for document_id, document_rows in rows.items():
+            vectors = (
+                np.asarray([row[3] for row in document_rows], dtype=np.float32)
+                if document_rows else np.zeros((0, 0), dtype=np.float32)
+            )
+            chunks[document_id] = {
+                "ids": [row[0] for row in document_rows],
+                "positions": {row[0]: i for i, row in enumerate(document_rows)},
+                "contents": [row[1] for row in document_rows],
+                "metadatas": [row[2] or {} for row in document_rows],
+                "vectors": vectors,
+                "squared_norms": np.einsum("ij,ij->i", vectors, vectors)
+            }
+        return chunks
+    
+    def _distances(self, vectors: np.ndarray, squared_norms: np.ndarray, embedding: List[float]) -> np.ndarray:
+        """Distance from the query to each vector in the collection's metric, as Chroma reports it"""
+        query = np.asarray(embedding, dtype=np.float32)
+        dots = vectors @ query
+        space = (self.vectorstore._collection.metadata or {}).get("hnsw:space", "l2")
+        if space == "cosine":
+            return 1 - dots / np.maximum(np.sqrt(squared_norms) * np.linalg.norm(query), 1e-12)
+        if space == "ip":
+            return 1 - dots
+        # Chroma reports squared L2 distances
+        return squared_norms - 2 * dots + query @ query
+    
+    def _nearest_chunks(self, documents: List[Dict], embedding: List[float], n: int) -> List[Dict]:
+        """Exact nearest chunks among the given documents, with distances in the collection's metric"""
+        documents = [document for document in documents if document["ids"]]
+        if not documents:
+            return []
+        with RETRIEVAL_SECONDS.time(step="scoped_vector"):
+            vectors = np.concatenate([document["vectors"] for document in documents])
+            squared_norms = np.concatenate([document["squared_norms"] for document in documents])
+            distances = self._distances(vectors, squared_norms, embedding)
+            
+            n = min(n, len(distances))
+            top = np.argpartition(distances, n - 1)[:n]
+            top = top[np.argsort(distances[top])]
+            offsets = np.cumsum([len(document["ids"]) for document in documents])
+            hits = []
+            for row in top:
+                document_index = int(np.searchsorted(offsets, row, side="right"))
+                document = documents[document_index]
+                i = int(row - (offsets[document_index - 1] if document_index else 0))
+                hits.append({
+                    "id": document["ids"][i],
+                    "content": document["contents"][i],
+                    "metadata": document["metadatas"][i],
+                    "distance": float(distances[row])
+                })
+            return hits
+    
+    def _cached_chunks(self, chunk_ids: List[str], document_ids: Collection[str]) -> Dict[str, Dict]:
+        """Chunks found among the documents already held for scoped search"""
+        found = {}
+        for document_id in document_ids:
+            document = self.document_chunks.get(document_id)
+            if document is None:
+                continue
+            for chunk_id in chunk_ids:
+                i = document["positions"].get(chunk_id)
+                if i is not None:
+                    found[chunk_id] = {
+                        "id": chunk_id,
+                        "content": document["contents"][i],
+                        "metadata": document["metadatas"][i],
+                        "vector": document["vectors"][i]
+                    }
+        return found
+    
+    async def _vector_search(self, embedding: List[float], n: int, document_ids: Optional[Collection[str]] = None) -> List[Dict]:
+        """Nearest chunks, scored in memory from cached vectors when the search is scoped to a few documents"""
+        # A scope known to outgrow the cache would be read from Chroma on every search, so it is filtered there instead
+        if document_ids is None or sum(self.document_sizes.get(d, 0) for d in document_ids) > self.document_chunks.maxsize:
+            return await self.vectorstore_executor.run(self._vector_hits, embedding, n, document_ids)
         
-        documents = [
-            Document(
-                page_content=chunk,
-                metadata={**metadata, "chunk_index": i}
+        documents = {document_id: self.document_chunks.get(document_id) for document_id in document_ids}
+        missing = [document_id for document_id, chunks in documents.items() if chunks is None]
+        if missing:
+            version = self.collection_version
+            with RETRIEVAL_SECONDS.time(step="scope_load"):
+                loaded = await self.vectorstore_executor.run(self._read_document_chunks, missing)
+            # A document that changed during the read would otherwise be cached stale
+            if version == self.collection_version:
+                for document_id, chunks in loaded.items():
+                    self.document_sizes[document_id] = len(chunks["ids"])
+                    self.document_chunks.set(document_id, chunks)
+            documents.update(loaded)
+        return await self.vectorstore_executor.run(self._nearest_chunks, list(documents.values()), embedding, n)
+    
+    def _keyword_hits(self, query: str, n: int, document_ids: Optional[Collection[str]] = None) -> List[Tuple[str, float]]:
+        with RETRIEVAL_SECONDS.time(step="keyword"):
+            return self.keyword_index.search(query, n, document_ids)
+    
+    def _chunks_by_id(self, chunk_ids: List[str]) -> Dict[str, Dict]:
+        stored = self.vectorstore._collection.get(ids=chunk_ids, include=["documents", "metadatas", "embeddings"])
+        return {
+            chunk_id: {"id": chunk_id, "content": content, "metadata": metadata or {}, "vector": vector}
+            for chunk_id, content, metadata, vector in zip(
+                stored["ids"], stored["documents"], stored["metadatas"], stored["embeddings"]
             )
-            for i, chunk in enumerate(chunks)
+        }
+    
+    async def _hybrid_hits(
+        self,
+        query: str,
+        embedding: List[float],
+        n: int,
+        document_ids: Optional[Collection[str]] = None
+    ) -> List[Dict]:
+        """Vector and BM25 hits merged by reciprocal rank fusion, best first, each with its rrf_score and distance"""
+        vector_hits, keyword_hits = await asyncio.gather(
+            self._vector_search(embedding, n, document_ids),
+            self.vectorstore_executor.run(self._keyword_hits, query, n, document_ids)
+        )
+        
+        fused: Dict[str, float] = {}
+        for ranking in ([hit["id"] for hit in vector_hits], [chunk_id for chunk_id, _ in keyword_hits]):
+            for rank, chunk_id in enumerate(ranking):
+                fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (settings.rrf_k + rank + 1)
+        
+        chunks = {hit["id"]: hit for hit in vector_hits}
+        keyword_only = [chunk_id for chunk_id, _ in keyword_hits if chunk_id not in chunks]
+        if keyword_only and document_ids is not None:
+            chunks.update(self._cached_chunks(keyword_only, document_ids))
+            keyword_only = [chunk_id for chunk_id in keyword_only if chunk_id not in chunks]
+        if keyword_only:
+            chunks.update(await self.vectorstore_executor.run(self._chunks_by_id, keyword_only))
+        
+        # Chunks only BM25 found get their vector distance too, so every result carries one
+        unmeasured = [chunk for chunk in chunks.values() if "vector" in chunk]
+        if unmeasured:
+            vectors = np.asarray([chunk.pop("vector") for chunk in unmeasured], dtype=np.float32)
+            distances = self._distances(vectors, np.einsum("ij,ij->i", vectors, vectors), embedding)
+            for chunk, distance in zip(unmeasured, distances):
+                chunk["distance"] = float(distance)
+        
+        return [
+            {**chunks[chunk_id], "rrf_score": score}
+            for chunk_id, score in sorted(fused.items(), key=lambda item: item[1], reverse=True)
+            if chunk_id in chunks
         ]
+    
+    def _start_rerank_job(self, func: Callable, *args) -> asyncio.Future:
+        """Run func on the rerank pool, counted as running until the worker finishes even if nobody awaits it"""
+        def finished(_):
+            self._reranks_running -= 1
+        
+        self._reranks_running += 1
+        job = asyncio.ensure_future(self.rerank_executor.run(func, *args))
+        job.add_done_callback(finished)
+        return job
+    
+    def _skip_rerank(self, reason: str) -> None:
+        RERANK_SKIPPED.inc(reason=reason)
+        return None
+    
+    async def _rerank(self, query: str, results: List[Dict]) -> Optional[List[Dict]]:
+        """Results reordered by cross-encoder score, or None if reranking was skipped"""
+        if not self.reranker.loaded:
+            # Loading takes longer than the budget, so it happens in the background
+            if self._reranks_running < max(settings.rerank_workers, 1):
+                self._start_rerank_job(self.reranker.load)
+            return self._skip_rerank("loading")
+        if self._reranks_running >= max(settings.rerank_workers, 1):
+            # A timed-out rerank still holds the worker; waiting behind it would blow the budget too
+            return self._skip_rerank("busy")
         
-        if documents:
-            self.vectorstore.add_documents(documents)
+        job = self._start_rerank_job(self.reranker.score, query, [r["content"] for r in results])
+        try:
+            with RETRIEVAL_SECONDS.time(step="rerank"):
+                # Shielded so a timeout leaves the job to finish and release its worker count
+                scores = await asyncio.wait_for(asyncio.shield(job), settings.rerank_timeout)
+        except asyncio.TimeoutError:
+            print(f"Rerank skipped: exceeded {settings.rerank_timeout}s budget")
+            return self._skip_rerank("timeout")
+        except Exception as e:
+            print(f"Rerank skipped: {e}")
+            return self._skip_rerank("error")
+        if scores is None:
+            return self._skip_rerank("unavailable")
         
-        return len(chunks)
+        ranked = sorted(zip(scores, range(len(results))), reverse=True)
+        return [{**results[i], "rerank_score": score} for score, i in ranked]
     
-    async def search(self, query: str, k: int = 3) -> List[Dict]:
-        """Search for relevant documents"""
-        if not self.vectorstore:
-            return []
+    async def search(
+        self,
+        query: str,
+        k: int = 3,
+        rerank: Optional[bool] = None,
+        document_ids: Optional[Collection[str]] = None
+    ) -> List[Dict]:
+        """Search for relevant documents, optionally only within document_ids and reranking a larger candidate set down to k.
+
+        Each result's score is its vector distance in the collection's metric,
+        lower is better, whatever ranked it; distance holds the same value.
+        Hybrid search adds rrf_score and reranking adds rerank_score, both
+        higher is better.
+        """
+        if rerank is None:
+            rerank = settings.rerank_enabled
+        rerank = rerank and self.reranker.available
+        scope = frozenset(document_ids) if document_ids else None
         
         try:
-            results = self.vectorstore.similarity_search_with_score(query, k=k)
+            version = self.collection_version
+            key = (" ".join(query.lower().split()), k, rerank, scope, version)
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                return list(cached)
+            
+            await self.warmup()
+            if not self.vectorstore:
+                return []
+            
+            embedding = await self.embed_query(query)
+            # Over-fetch so identical chunks from re-uploaded files can be collapsed
+            candidates = max(k * 2, settings.rerank_candidates if rerank else 0)
+            if self.keyword_index is not None:
+                hits = await self._hybrid_hits(query, embedding, max(candidates, settings.hybrid_candidates), scope)
+            else:
+                hits = await self._vector_search(embedding, candidates, scope)
             
-            return [
-                {
-                    "content": doc.page_content,
-                    "source": doc.metadata.get("filename", "Unknown"),
-                    "score": float(score),
-                    "metadata": doc.metadata
+            results = []
+            seen = set()
+            for hit in hits:
+                fingerprint = hit["metadata"].get("chunk_hash") or hit["content"]
+                if fingerprint in seen:
+                    continue
+                seen.add(fingerprint)
+                result = {
+                    "content": hit["content"],
+                    "source": hit["metadata"].get("filename", "Unknown"),
+                    "score": float(hit["distance"]),
+                    "distance": float(hit["distance"]),
+                    "metadata": hit["metadata"]
                 }
-                for doc, score in results
-            ]
+                if "rrf_score" in hit:
+                    result["rrf_score"] = hit["rrf_score"]
+                results.append(result)
+            cacheable = True
+            if rerank and len(results) > 1:
+                reranked = await self._rerank(query, results[:settings.rerank_candidates])
+                # Retrieval order is only a fallback, not the answer for a reranked key
+                if reranked is None:
+                    cacheable = False
+                else:
+                    results = reranked
+            results = results[:k]
+            # Results computed against an older collection are never reachable
+            if cacheable and version == self.collection_version:
+                self.result_cache.set(key, results)
+            return list(results)
         except Exception as e:
             print(f"Search error: {e}")
             return []
     
-    async def delete_document(self, document_id: str):
-        """Delete document from vector store"""
+    async def sync_keyword_index(self, batch_size: int = 1000):
+        """Build the keyword index from the vector store if it was populated before hybrid search"""
+        await self.warmup()
+        if self.keyword_index is None or not self.vectorstore or len(self.keyword_index):
+            return
+        
+        collection = self.vectorstore._collection
+        total = await self.vectorstore_executor.run(collection.count)
+        for offset in range(0, total, batch_size):
+            stored = await self.vectorstore_executor.run(
+                collection.get, offset=offset, limit=batch_size, include=["documents", "metadatas"]
+            )
+            document_ids = [(metadata or {}).get("document_id", "") for metadata in stored["metadatas"]]
+            await self.vectorstore_executor.run(
+                self.keyword_index.add, stored["ids"], stored["documents"], document_ids
+            )
+        if total:
+            print(f"Built keyword index for {total} chunks")
+            self._bump_version()
+    
+    async def reset(self):
+        """Drop every vector from the collection, keeping the embedding cache"""
+        await self.warmup()
         if self.vectorstore:
-            try:
-                self.vectorstore.delete(where={"document_id": document_id})
-            except Exception as e:
-                print(f"Delete error: {e}")
+            await self.vectorstore_executor.run(self.vectorstore.delete_collection)
+        self._init_vectorstore()
+        if self.keyword_index is not None:
+            await self.vectorstore_executor.run(self.keyword_index.clear)
+        self._bump_version()
+    
+    async def delete_document(self, document_id: str):
+        """Delete document from vector store, raising if the store can't be loaded or written"""
+        await self.warmup()
+        if not self.vectorstore:
+            raise RuntimeError("Vector store is not available")
+        # Chroma.delete only forwards ids, so filter on the collection directly
+        await self.vectorstore_executor.run(
+            self.vectorstore._collection.delete,
+            where={"document_id": document_id}
+        )
+        if self.keyword_index is not None:
+            await self.vectorstore_executor.run(self.keyword_index.delete_document, document_id)
+        self._bump_version(document_id)
 
 rag_service = RAGService()
\ No newline at end of file
@@ -0,0 +1,41 @@
+from typing import List, Optional
+import threading
+
+class Reranker:
+    """CPU cross-encoder scoring (query, passage) pairs, loaded on first use"""
+
+    def __init__(self, model_name: str, batch_size: int = 32):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.available = True
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self):
+        """Load the model if it isn't yet, returning it or None if it can't be loaded"""
+        with self._lock:
+            if self._model is None and self.available:
+                try:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name, device="cpu")
+                except Exception as e:
+                    # Without sentence-transformers or the model, search keeps fusion order
+                    print(f"Reranker unavailable: {e}")
+                    self.available = False
+        return self._model
+
+    def score(self, query: str, passages: List[str]) -> Optional[List[float]]:
+        """Relevance of each passage to the query, or None if no model can be loaded"""
+        model = self.load()
+        if model is None:
+            return None
+        scores = model.predict(
+            [(query, passage) for passage in passages],
+            batch_size=self.batch_size,
+            show_progress_bar=False
+        )
+        return [float(score) for score in scores]
@@ -1,32 +1,139 @@
+from abc import ABC, abstractmethod
+from contextlib import nullcontext
 from duckduckgo_search import DDGS
-from typing import List, Dict
+from app.config import settings
+from app.utils.cache import TTLCache
+from app.utils.executors import BlockingExecutor
+from app.utils.metrics import WEB_SEARCH_SECONDS
+from typing import Dict, List, Optional, Tuple
 import asyncio
+import time
 
-class SearchService:
+class SearchBackend(ABC):
+    """Blocking web search returning dicts with title, url and snippet"""
+
+    @abstractmethod
+    def text(self, query: str, max_results: int) -> List[Dict]:
+        ...
+
+class DuckDuckGoBackend(SearchBackend):
     def __init__(self):
         self.ddgs = DDGS()
-    
+
+    def text(self, query: str, max_results: int) -> List[Dict]:
+        return [
+            {
+                "title": r.get("title", ""),
+                "url": r.get("href", ""),
+                "snippet": r.get("body", "")
+            }
+            for r in self.ddgs.text(query, max_results=max_results)
+        ]
+
+class StubSearchBackend(SearchBackend):
+    """Deterministic offline results for tests and benchmarks"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def text(self, query: str, max_results: int) -> List[Dict]:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return [
+            {
+                "title": f"Result {i} for {query}",
+                "url": f"https://example.com/search/{i}",
+                "snippet": f"Stub snippet {i} about {query}."
+            }
+            for i in range(1, max_results + 1)
+        ]
+
+SEARCH_BACKENDS = {
+    "duckduckgo": DuckDuckGoBackend,
+    "stub": StubSearchBackend
+}
+
+class TokenBucket:
+    """Limits call rate to `rate` per second with bursts of up to `burst`"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated_at = time.monotonic()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+        # Reserve a token up front; a negative balance is this caller's place in line
+        self.tokens -= 1
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+class SearchService:
+    def __init__(self, backend: Optional[SearchBackend] = None):
+        self.backend = backend or SEARCH_BACKENDS[settings.web_search_backend]()
+        self.cache = TTLCache(settings.web_search_cache_size, settings.web_search_cache_ttl)
+        self.executor = BlockingExecutor("web-search", settings.web_search_max_concurrency)
+        self.limiter = TokenBucket(settings.web_search_rate, settings.web_search_burst)
+        # With no workers searches run inline on the event loop, one at a time, so there is nothing to bound
+        self._semaphore = (
+            asyncio.Semaphore(settings.web_search_max_concurrency)
+            if settings.web_search_max_concurrency > 0 else nullcontext()
+        )
+        self._inflight: Dict[Tuple[str, int], asyncio.Task] = {}
+        self.deduplicated = 0
+
     async def search(self, query: str, max_results: int = 5) -> List[Dict]:
-        """Perform web search using DuckDuckGo"""
+        """Perform web search, sharing cached and in-flight results for identical queries"""
+        key = (" ".join(query.lower().split()), max_results)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return list(cached)
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(key, query, max_results))
+            self._inflight[key] = task
+        else:
+            self.deduplicated += 1
+
+        # Shielded so one caller timing out does not cancel the search for the others
+        return list(await asyncio.shield(task))
+
+    async def _fetch(self, key: Tuple[str, int], query: str, max_results: int) -> List[Dict]:
         try:
-            # Run in thread pool since duckduckgo_search is synchronous
-            loop = asyncio.get_event_loop()
-            results = await loop.run_in_executor(
-                None,
-                lambda: list(self.ddgs.text(query, max_results=max_results))
-            )
-            
-            return [
-                {
-                    "title": r.get("title", ""),
-                    "url": r.get("href", ""),
-                    "snippet": r.get("body", ""),
-                    "source": "web_search"
-                }
-                for r in results
-            ]
+            async with self._semaphore:
+                await self.limiter.acquire()
+                started = time.perf_counter()
+                try:
+                    results = await self.executor.run(self.backend.text, query, max_results)
+                except Exception:
+                    WEB_SEARCH_SECONDS.observe(time.perf_counter() - started, outcome="error")
+                    raise
+                WEB_SEARCH_SECONDS.observe(time.perf_counter() - started, outcome="ok")
+
+            results = [{**r, "source": "web_search"} for r in results]
+            self.cache.set(key, results)
+            return results
         except Exception as e:
             print(f"Search error: {e}")
             return []
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict:
+        return {
+            **self.cache.stats(),
+            "deduplicated": self.deduplicated,
+            "inflight": len(self._inflight)
+        }
 
 search_service = SearchService()
\ No newline at end of file
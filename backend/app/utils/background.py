@@ -0,0 +1,20 @@
+from typing import Coroutine, Set
+import asyncio
+
+_tasks: Set[asyncio.Task] = set()
+
+def spawn(coro: Coroutine) -> asyncio.Task:
+    """Run a coroutine in the background, independent of the request that started it"""
+    task = asyncio.create_task(coro)
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return task
+
+async def drain(timeout: float = 5.0):
+    """Give background tasks a chance to finish at shutdown, then cancel the rest"""
+    if not _tasks:
+        return
+    _, pending = await asyncio.wait(set(_tasks), timeout=timeout)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
\ No newline at end of file
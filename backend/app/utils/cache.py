@@ -0,0 +1,69 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+import time
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries also expire after ttl seconds.
+
+    maxsize bounds the number of entries, or their total weight if weigh is
+    given; an entry heavier than maxsize on its own is not cached.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None, weigh: Optional[Callable[[Any], int]] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.weigh = weigh
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at is None or expires_at > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            self.pop(key)
+
+        self.misses += 1
+        return default
+
+    def _weight_of(self, value: Any) -> int:
+        return self.weigh(value) if self.weigh else 1
+
+    def set(self, key: Hashable, value: Any):
+        self.pop(key)
+        weight = self._weight_of(value)
+        if weight > self.maxsize:
+            return
+
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        self._data[key] = (value, expires_at)
+        self.weight += weight
+        while self.weight > self.maxsize:
+            _, (evicted, _) = self._data.popitem(last=False)
+            self.weight -= self._weight_of(evicted)
+
+    def pop(self, key: Hashable):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.weight -= self._weight_of(entry[0])
+
+    def clear(self):
+        self._data.clear()
+        self.weight = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
\ No newline at end of file
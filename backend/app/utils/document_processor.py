@@ -1,32 +1,102 @@
+import multiprocessing
 import os
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
 from pypdf import PdfReader
 from docx import Document as DocxDocument
-from typing import Tuple
+from app.config import settings
+from typing import Callable, Iterator, List, Optional
+
+PDF_PAGES_PER_TASK = 16
+TEXT_READ_SIZE = 64 * 1024
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        # Forking the server would copy its threads' locks and the event loop into each worker
+        _process_pool = ProcessPoolExecutor(
+            max_workers=settings.pdf_extraction_processes,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _process_pool
+
+def shutdown_process_pool():
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+def _extract_pdf_pages(file_path: str, start: int, stop: int) -> List[str]:
+    """Extract a range of PDF pages; runs in a worker process"""
+    reader = PdfReader(file_path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+def _iter_pdf_parallel(file_path: str, page_count: int) -> Iterator[str]:
+    """Yield pages in order while a bounded window of page ranges is extracted in parallel"""
+    pool = _get_process_pool()
+    ranges = iter(range(0, page_count, PDF_PAGES_PER_TASK))
+    window = deque()
+
+    def submit_next():
+        start = next(ranges, None)
+        if start is not None:
+            stop = min(start + PDF_PAGES_PER_TASK, page_count)
+            window.append(pool.submit(_extract_pdf_pages, file_path, start, stop))
+
+    for _ in range(settings.pdf_extraction_processes * 2):
+        submit_next()
 
-async def process_document(file_path: str, file_type: str) -> Tuple[str, int]:
-    """Extract text from various document formats"""
-    text = ""
-    
+    try:
+        while window:
+            pages = window.popleft().result()
+            submit_next()
+            yield from pages
+    finally:
+        for future in window:
+            future.cancel()
+
+def iter_document_text(
+    file_path: str,
+    file_type: str,
+    on_page: Optional[Callable[[int, int], None]] = None
+) -> Iterator[str]:
+    """Yield document text incrementally, reporting (pages_parsed, page_count) via on_page"""
     try:
         if file_type == "pdf":
-            reader = PdfReader(file_path)
-            for page in reader.pages:
-                text += page.extract_text() or ""
-        
+            page_count = len(PdfReader(file_path).pages)
+            if settings.pdf_extraction_processes > 1 and page_count >= settings.pdf_parallel_min_pages:
+                pages = _iter_pdf_parallel(file_path, page_count)
+            else:
+                reader = PdfReader(file_path)
+                pages = (page.extract_text() or "" for page in reader.pages)
+
+            for i, page_text in enumerate(pages, 1):
+                yield page_text
+                if on_page:
+                    on_page(i, page_count)
+
         elif file_type == "docx":
             doc = DocxDocument(file_path)
             for para in doc.paragraphs:
-                text += para.text + "\n"
-        
+                yield para.text + "\n"
+            if on_page:
+                on_page(1, 1)
+
         elif file_type in ["txt", "md"]:
             with open(file_path, "r", encoding="utf-8") as f:
-                text = f.read()
-        
+                while True:
+                    block = f.read(TEXT_READ_SIZE)
+                    if not block:
+                        break
+                    yield block
+            if on_page:
+                on_page(1, 1)
+
         else:
             raise ValueError(f"Unsupported file type: {file_type}")
-        
-        return text.strip(), len(text)
-    
+
     except Exception as e:
         raise Exception(f"Error processing document: {str(e)}")
 
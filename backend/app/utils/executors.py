@@ -0,0 +1,34 @@
+from concurrent.futures import ThreadPoolExecutor
+from app.config import settings
+from typing import Any, Callable
+import asyncio
+import functools
+
+class BlockingExecutor:
+    """Bounded thread pool for blocking library calls made from async code"""
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        # max_workers=0 runs calls inline on the event loop
+        self._pool = (
+            ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+            if max_workers > 0 else None
+        )
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Run func(*args, **kwargs) on the pool and await its result"""
+        if self._pool is None:
+            return func(*args, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, functools.partial(func, *args, **kwargs))
+
+    def shutdown(self):
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+# MiniLM inference is already multi-threaded inside torch, so a small pool is enough
+embedding_executor = BlockingExecutor("embedding", settings.embedding_workers)
+vectorstore_executor = BlockingExecutor("vectorstore", settings.vectorstore_workers)
+rerank_executor = BlockingExecutor("rerank", settings.rerank_workers)
\ No newline at end of file
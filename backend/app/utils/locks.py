@@ -0,0 +1,45 @@
+from contextlib import contextmanager
+from app.config import settings
+from typing import IO, Iterator
+import os
+
+try:
+    import fcntl
+except ImportError:
+    # No flock on Windows; stores there must only be written by one process
+    fcntl = None
+
+class LockHeld(Exception):
+    pass
+
+def server_lock_path() -> str:
+    """Held shared by every running server process, so maintenance commands can tell"""
+    return os.path.join(settings.chroma_persist_dir, "server.lock")
+
+@contextmanager
+def file_lock(path: str, exclusive: bool = True, blocking: bool = True) -> Iterator[None]:
+    """Hold an advisory lock on path across processes for the enclosed block"""
+    f = acquire(path, exclusive, blocking)
+    try:
+        yield
+    finally:
+        release(f)
+
+def acquire(path: str, exclusive: bool = True, blocking: bool = True) -> IO:
+    """Open path and lock it, raising LockHeld if blocking is off and another process holds it"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    f = open(path, "a+b")
+    if fcntl is None:
+        return f
+    flags = (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | (0 if blocking else fcntl.LOCK_NB)
+    try:
+        fcntl.flock(f, flags)
+    except BlockingIOError:
+        f.close()
+        raise LockHeld(path)
+    return f
+
+def release(f: IO):
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_UN)
+    f.close()
@@ -0,0 +1,214 @@
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import bisect
+import math
+import threading
+import time
+
+# Prometheus text exposition format; the response adds the utf-8 charset
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Seconds, from cache hits and index lookups up to long generations
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Tokens or pages per second
+RATE_BUCKETS = (1.0, 2.0, 5.0, 10.0, 20.0, 50.0, 100.0, 200.0, 500.0, 1000.0)
+
+LabelValues = Tuple[str, ...]
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+class Registry:
+    """Metrics rendered together at /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, "Metric"] = {}
+
+    def register(self, metric: "Metric"):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        return "".join(metric.render() for metric in self._metrics.values())
+
+REGISTRY = Registry()
+
+class Metric(ABC):
+    type = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: Optional[Registry] = REGISTRY
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if len(labels) != len(self.labelnames) or set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: LabelValues, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Exposition lines of every series, without the HELP and TYPE header"""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.type}"]
+        return "\n".join(lines + self.samples()) + "\n"
+
+class Counter(Metric):
+    """Monotonic total; collect, if given, reads the current values from elsewhere at render time"""
+    type = "counter"
+
+    def __init__(self, *args, collect: Optional[Callable[[], Dict[LabelValues, float]]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.collect = collect
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        if self.collect is not None:
+            values.update(self.collect())
+        return [f"{self.name}{self._labels(key)} {_format_value(value)}" for key, value in sorted(values.items())]
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, with their sum and count"""
+    type = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(float(bound) for bound in buckets))
+        # Per label set: a count per bucket (the last one is +Inf), the sum and the count
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, totals = self._series.get(key) or self._series.setdefault(
+                key, ([0] * (len(self.buckets) + 1), [0.0, 0])
+            )
+            counts[index] += 1
+            totals[0] += value
+            totals[1] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observe the wall time of the enclosed block in seconds"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = {key: (list(counts), list(totals)) for key, (counts, totals) in self._series.items()}
+
+        lines = []
+        for key, (counts, (total, count)) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{self._labels(key, (('le', _format_value(bound)),))} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{self._labels(key)} {count}")
+        return lines
+
+def render() -> str:
+    return REGISTRY.render()
+
+CHAT_STAGE_SECONDS = Histogram(
+    "fyora_chat_stage_seconds",
+    "Duration of each stage of a chat request",
+    ["endpoint", "stage"]
+)
+LLM_TOKENS_PER_SECOND = Histogram(
+    "fyora_llm_tokens_per_second",
+    "Output tokens per second of each generated response",
+    buckets=RATE_BUCKETS
+)
+LLM_OUTPUT_TOKENS = Counter("fyora_llm_output_tokens_total", "Tokens generated by the LLM")
+EMBEDDING_SECONDS = Histogram(
+    "fyora_embedding_seconds",
+    "Embedding latency: single queries including batching wait, and model calls on batches of texts",
+    ["operation"]
+)
+EMBEDDING_BATCH_SIZE = Histogram(
+    "fyora_embedding_batch_size",
+    "Distinct texts per batched query embedding call",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
+)
+EMBEDDING_QUEUE_SECONDS = Histogram(
+    "fyora_embedding_queue_seconds",
+    "Time a query embedding waited for its batch to start"
+)
+RETRIEVAL_SECONDS = Histogram(
+    "fyora_retrieval_seconds",
+    "Duration of each document retrieval step",
+    ["step"]
+)
+RERANK_SKIPPED = Counter(
+    "fyora_rerank_skipped_total",
+    "Searches that kept retrieval order instead of reranking",
+    ["reason"]
+)
+WEB_SEARCH_SECONDS = Histogram(
+    "fyora_web_search_seconds",
+    "Web search backend latency for uncached queries",
+    ["outcome"]
+)
+DB_QUERY_SECONDS = Histogram(
+    "fyora_db_query_seconds",
+    "Database statement execution time",
+    ["operation"]
+)
+UPLOAD_SECONDS = Histogram("fyora_upload_seconds", "Time to receive and hash an uploaded file")
+INGESTION_SECONDS = Histogram(
+    "fyora_ingestion_seconds",
+    "Time to parse and embed a document",
+    ["status"],
+    buckets=LATENCY_BUCKETS + (120.0, 300.0, 600.0)
+)
+INGESTION_PAGES_PER_SECOND = Histogram(
+    "fyora_ingestion_pages_per_second",
+    "Pages parsed and embedded per second for each ingested document",
+    buckets=RATE_BUCKETS
+)
+INGESTION_PAGES = Counter("fyora_ingestion_pages_total", "Pages ingested")
+INGESTION_CHUNKS = Counter("fyora_ingestion_chunks_total", "Chunks embedded during ingestion")
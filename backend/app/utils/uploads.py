@@ -0,0 +1,131 @@
+from fastapi import HTTPException, UploadFile
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.utils.document_processor import get_file_type
+from typing import Tuple
+import asyncio
+import hashlib
+import os
+import re
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Room for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+# How much of the body is held back looking for the first part's filename
+HEADER_PEEK_SIZE = 8 * 1024
+FILENAME_PATTERN = re.compile(rb'filename="([^"]*)"')
+UNSUPPORTED_TYPE_MESSAGE = "Unsupported file type. Allowed: PDF, DOCX, TXT, MD"
+
+class UploadTooLarge(Exception):
+    pass
+
+def format_size(size: int) -> str:
+    """Byte count in the largest unit it reaches, e.g. "50 MB" or "512 KB"""
+    for unit, scale in (("MB", 1024 * 1024), ("KB", 1024)):
+        if size >= scale:
+            return f"{size / scale:g} {unit}"
+    return f"{size} bytes"
+
+def limit_message(max_size: int) -> str:
+    return f"File exceeds the {format_size(max_size)} upload limit"
+
+async def save_upload(file: UploadFile, file_path: str, max_size: int) -> Tuple[int, str]:
+    """Stream an upload to disk in chunks, returning its size and SHA-256 hex digest"""
+    loop = asyncio.get_running_loop()
+    digest = hashlib.sha256()
+    size = 0
+
+    f = await loop.run_in_executor(None, open, file_path, "wb")
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+
+            size += len(chunk)
+            if size > max_size:
+                raise UploadTooLarge(limit_message(max_size))
+
+            digest.update(chunk)
+            await loop.run_in_executor(None, f.write, chunk)
+    except BaseException:
+        await loop.run_in_executor(None, f.close)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+
+    await loop.run_in_executor(None, f.close)
+    return size, digest.hexdigest()
+
+class UploadLimitMiddleware:
+    """Rejects oversized or non-multipart uploads from their headers, and files with an
+    unsupported extension from the first part's headers, before Starlette spools the
+    body. Bodies without a Content-Length stop being read as soon as they pass the limit.
+    """
+
+    def __init__(self, app: ASGIApp, path_suffix: str, max_size: int):
+        self.app = app
+        self.path_suffix = path_suffix
+        self.max_size = max_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http" and scope["method"] == "POST" and scope["path"].endswith(self.path_suffix):
+            headers = dict(scope["headers"])
+            content_type = headers.get(b"content-type", b"").decode("latin-1")
+            content_length = headers.get(b"content-length")
+
+            response = None
+            if not content_type.startswith("multipart/form-data"):
+                response = JSONResponse({"detail": "Expected a multipart/form-data upload"}, status_code=415)
+            elif content_length and content_length.isdigit() and int(content_length) > self.max_size + MULTIPART_OVERHEAD:
+                # Only an estimate with the multipart framing; save_upload checks the file's exact size
+                response = JSONResponse({"detail": limit_message(self.max_size)}, status_code=413)
+
+            buffered = []
+            if not response:
+                buffered = await self._peek(receive)
+                filename = self._first_filename(buffered)
+                if filename is not None and get_file_type(filename) == "unknown":
+                    response = JSONResponse({"detail": UNSUPPORTED_TYPE_MESSAGE}, status_code=400)
+
+            if response:
+                await response(scope, receive, send)
+                return
+
+            # Chunked bodies (and lying Content-Lengths) are counted as Starlette spools them
+            received = 0
+
+            async def limited_receive():
+                nonlocal received
+                message = buffered.pop(0) if buffered else await receive()
+                if message["type"] == "http.request":
+                    received += len(message.get("body", b""))
+                    if received > self.max_size + MULTIPART_OVERHEAD:
+                        # Raised into the form parser, which passes HTTPExceptions through as responses
+                        raise HTTPException(status_code=413, detail=limit_message(self.max_size))
+                return message
+
+            await self.app(scope, limited_receive, send)
+            return
+
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def _peek(receive: Receive) -> list:
+        """Read body messages until the first part's headers have arrived, to be replayed to the app"""
+        messages, head = [], b""
+        while b"\r\n\r\n" not in head and len(head) < HEADER_PEEK_SIZE:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            head += message.get("body", b"")
+            if not message.get("more_body", False):
+                break
+        return messages
+
+    @staticmethod
+    def _first_filename(messages: list):
+        head = b"".join(message.get("body", b"") for message in messages if message["type"] == "http.request")
+        match = FILENAME_PATTERN.search(head.split(b"\r\n\r\n", 1)[0])
+        return match.group(1).decode("utf-8", "replace") if match else None
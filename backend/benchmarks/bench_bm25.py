@@ -0,0 +1,96 @@
+"""Build time, on-disk size and query latency of the BM25 keyword index at
+increasing corpus sizes.
+
+Chunks are synthetic text drawn from a Zipf-distributed vocabulary with a
+sprinkling of identifiers, added in ingestion-sized batches so segment
+merging is exercised the same way as in production:
+
+    python -m benchmarks.bench_bm25 --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+import numpy as np
+from app.services.bm25_index import BM25Index
+
+BATCH_SIZE = 64
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def make_corpus(seed: int, vocabulary: int, words_per_chunk: int):
+    rng = np.random.default_rng(seed)
+    words = [f"w{i}" for i in range(vocabulary)]
+    weights = 1 / np.arange(1, vocabulary + 1)
+    weights /= weights.sum()
+
+    def chunks(n):
+        for start in range(0, n, BATCH_SIZE):
+            size = min(BATCH_SIZE, n - start)
+            ids = rng.choice(vocabulary, size=(size, words_per_chunk), p=weights)
+            texts = [" ".join(words[i] for i in row) for row in ids]
+            # Roughly one chunk in twenty mentions an error code
+            for j in range(0, size, 20):
+                texts[j] += f" ERR_{rng.integers(100000):05d}"
+            yield [f"doc{(start + j) // 500}:{(start + j) % 500}" for j in range(size)], texts
+
+    return words, weights, chunks
+
+def directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+def bench(size: int, args):
+    directory = tempfile.mkdtemp(prefix="fyora-bm25-")
+    words, weights, chunks = make_corpus(size, args.vocabulary, args.words_per_chunk)
+    index = BM25Index(directory)
+
+    started = time.perf_counter()
+    for ids, texts in chunks(size):
+        index.add(ids, texts, [chunk_id.rpartition(":")[0] for chunk_id in ids])
+    build = time.perf_counter() - started
+
+    started = time.perf_counter()
+    index = BM25Index(directory)
+    load = time.perf_counter() - started
+
+    rng = random.Random(size)
+    queries = []
+    for i in range(args.queries):
+        terms = [words[j] for j in np.random.default_rng(i).choice(len(words), size=rng.randint(2, 5), p=weights)]
+        if i % 3 == 0:
+            terms.append(f"ERR_{rng.randrange(100000):05d}")
+        queries.append(" ".join(terms))
+
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query, args.k)
+        latencies.append(time.perf_counter() - started)
+
+    print(
+        f"{size:>9} chunks: build {build:6.1f}s ({size / build:7.0f} chunks/s)  load {load:5.2f}s  "
+        f"disk {directory_size(directory) / 2**20:7.1f} MiB  segments {len(index._segments):2d}  "
+        f"query p50 {statistics.median(latencies) * 1000:6.2f} ms  p99 {percentile(latencies, 99) * 1000:6.2f} ms"
+    )
+    shutil.rmtree(directory)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--vocabulary", type=int, default=50_000)
+    parser.add_argument("--words-per-chunk", type=int, default=150)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        bench(size, args)
+
+if __name__ == "__main__":
+    main()
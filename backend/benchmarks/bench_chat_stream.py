@@ -0,0 +1,141 @@
+"""Latency of concurrent /api/chat/stream requests with embedding and Chroma
+calls inline on the event loop versus offloaded to the executor layer with
+query micro-batching.
+
+The LLM and embedding model are replaced with local stand-ins so the numbers
+only reflect how the service schedules work:
+
+    python -m benchmarks.bench_chat_stream --concurrency 32 --requests 256
+"""
+import argparse
+import asyncio
+import atexit
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+_workdir = tempfile.mkdtemp(prefix="fyora-bench-")
+atexit.register(shutil.rmtree, _workdir, ignore_errors=True)
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_workdir}/chat.db")
+os.environ.setdefault("CHROMA_PERSIST_DIR", os.path.join(_workdir, "chroma_db"))
+os.environ.setdefault("UPLOAD_DIR", os.path.join(_workdir, "uploads"))
+# The LLM and embeddings are stand-ins; the placeholder only keeps a stray real client from failing
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+import httpx
+from app.database import init_db
+from app.main import app
+from app.services.answer_cache import answer_cache
+from app.services.llm_service import llm_service
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.rag_service import rag_service
+from app.utils.executors import BlockingExecutor
+
+class SlowEmbeddings:
+    """Deterministic embedder that blocks like a CPU forward pass.
+
+    Each call costs a fixed overhead plus a smaller per-text cost, roughly
+    how sentence-transformers amortises work across a batch.
+    """
+
+    def __init__(self, latency: float, size: int = 384):
+        self.latency = latency
+        self.size = size
+
+    def _vector(self, text: str):
+        seed = sum(map(ord, text)) or 1
+        return [((seed * (i + 1)) % 97) / 97 for i in range(self.size)]
+
+    def embed_query(self, text: str):
+        return self.embed_documents([text])[0]
+
+    def embed_documents(self, texts):
+        time.sleep(self.latency * (1 + 0.1 * (len(texts) - 1)))
+        return [self._vector(t) for t in texts]
+
+async def fake_stream(prompt):
+    for token in ("This ", "is ", "a ", "benchmark ", "answer."):
+        await asyncio.sleep(0.005)
+        yield token
+
+async def fake_title(first_message):
+    return "Benchmark"
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+async def run(args, offload: bool):
+    # Both passes ask the same questions, so neither may start with the other's cached vectors or results
+    rag_service.embedding_cache.clear()
+    rag_service.result_cache.clear()
+    answer_cache.clear()
+    rag_service.embeddings = SlowEmbeddings(args.embed_latency)
+    rag_service._init_vectorstore()
+    workers = (args.embedding_workers, args.vectorstore_workers) if offload else (0, 0)
+    rag_service.embedding_executor = BlockingExecutor("embedding", workers[0])
+    rag_service.vectorstore_executor = BlockingExecutor("vectorstore", workers[1])
+    rag_service.query_batcher = EmbeddingBatcher(
+        rag_service._embed_batch,
+        max_batch_size=args.batch_size if offload else 1,
+        max_wait_ms=args.batch_wait_ms
+    )
+    llm_service.generate_stream = fake_stream
+    llm_service.generate_title = fake_title
+
+    await init_db()
+    await rag_service.add_documents("benchmark corpus " * 500, {"document_id": "bench", "filename": "bench.txt"})
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        thread = (await client.post("/api/threads/", json={"title": "bench"})).json()
+        semaphore = asyncio.Semaphore(args.concurrency)
+        latencies = []
+
+        async def one(i):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/api/chat/stream", json={
+                    "message": f"question {i}",
+                    "thread_id": thread["id"]
+                })
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - started
+
+    rag_service.embedding_executor.shutdown()
+    rag_service.vectorstore_executor.shutdown()
+
+    label = "executor" if offload else "inline"
+    print(
+        f"{label:>8}: {args.requests / elapsed:7.1f} req/s  "
+        f"p50 {statistics.median(latencies) * 1000:7.1f} ms  "
+        f"p99 {percentile(latencies, 99) * 1000:7.1f} ms"
+    )
+    stats = rag_service.query_batcher.stats()
+    print(
+        f"{'':>8}  {stats['batches']} query batches, mean size {stats['mean_batch_size']:.1f}, "
+        f"mean queue delay {stats['mean_queue_delay_ms']:.1f} ms"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=128)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--embed-latency", type=float, default=0.02, help="seconds per embedding")
+    parser.add_argument("--embedding-workers", type=int, default=1)
+    parser.add_argument("--vectorstore-workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--batch-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    asyncio.run(run(args, offload=False))
+    asyncio.run(run(args, offload=True))
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,65 @@
+"""Per-request overhead of building the chat prompt: constructing a template
+and chain for every request versus reusing the chain compiled at startup.
+
+Only prompt construction and formatting are timed; the LLM is never called:
+
+    python -m benchmarks.bench_prompt_build --iterations 2000
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from app.services.llm_service import llm_service
+
+def sample_prompt():
+    history = [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"Message {i} about the quarterly report."}
+        for i in range(12)
+    ]
+    rag_context = [
+        {"source": "report.pdf", "content": "Revenue grew 12% year over year. " * 20}
+        for _ in range(3)
+    ]
+    return llm_service.build_prompt("What drove revenue growth?", history, rag_context, [])
+
+def per_request(prompt):
+    """How every request built its chain before chains were compiled at startup"""
+    context = prompt.context
+    prompt_template = ChatPromptTemplate.from_messages([
+        ("system", llm_service.system_prompt + ("\n\nContext:\n" + context if context else "")),
+        MessagesPlaceholder(variable_name="chat_history"),
+        ("human", "{input}")
+    ])
+    chain = prompt_template | llm_service.llm | StrOutputParser()
+    return chain.first.invoke({"input": prompt.input, "chat_history": prompt.history})
+
+def prebuilt(prompt):
+    return llm_service.chain.first.invoke(llm_service._chain_inputs(prompt))
+
+def bench(label, fn, prompt, iterations):
+    fn(prompt)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(prompt)
+    per_call = (time.perf_counter() - started) / iterations
+    print(f"{label:>12}: {per_call * 1e6:8.1f} us/request")
+    return per_call
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    prompt = sample_prompt()
+    assert per_request(prompt).to_messages() == prebuilt(prompt).to_messages()
+
+    before = bench("per-request", per_request, prompt, args.iterations)
+    after = bench("prebuilt", prebuilt, prompt, args.iterations)
+    print(f"{'speedup':>12}: {before / after:8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Search latency as the corpus grows, over the whole collection versus a
+fixed set of documents selected with document_ids.
+
+The corpus is grown in steps to each size; the scoped set is the same few
+documents throughout, so scoped latency should stay close to flat while
+unscoped latency follows the corpus. Embeddings are random unit vectors and
+chunk text is drawn from a Zipf vocabulary, so no model is needed:
+
+    python -m benchmarks.bench_scoped_search --sizes 10000 50000 100000
+"""
+import argparse
+import asyncio
+import atexit
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+_workdir = tempfile.mkdtemp(prefix="fyora-bench-")
+atexit.register(shutil.rmtree, _workdir, ignore_errors=True)
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_workdir}/chat.db")
+os.environ.setdefault("CHROMA_PERSIST_DIR", os.path.join(_workdir, "chroma_db"))
+os.environ.setdefault("UPLOAD_DIR", os.path.join(_workdir, "uploads"))
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+import numpy as np
+from app.services.embedding_store import EmbeddingStore
+from app.services.rag_service import rag_service
+
+BATCH_SIZE = 1000
+DIMENSIONS = 384
+
+class RandomEmbeddings:
+    """Unit vectors seeded by the text, so repeated texts embed identically"""
+
+    def _vector(self, text: str):
+        rng = np.random.default_rng(abs(hash(text)) % 2**32)
+        vector = rng.standard_normal(DIMENSIONS).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts):
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+class Corpus:
+    def __init__(self, args):
+        self.rng = np.random.default_rng(0)
+        self.words = np.array([f"w{i}" for i in range(args.vocabulary)])
+        weights = 1 / np.arange(1, args.vocabulary + 1)
+        self.weights = weights / weights.sum()
+        self.words_per_chunk = args.words_per_chunk
+        self.chunks_per_document = args.chunks_per_document
+        self.size = 0
+
+    def texts(self, n: int):
+        ids = self.rng.choice(len(self.words), size=(n, self.words_per_chunk), p=self.weights)
+        return [" ".join(row) for row in self.words[ids]]
+
+    def query(self, i: int) -> str:
+        rng = np.random.default_rng(i)
+        return " ".join(self.words[rng.choice(len(self.words), size=rng.integers(2, 6), p=self.weights)])
+
+    def grow(self, target: int):
+        """Add chunks until the corpus holds target of them, a document every chunks_per_document"""
+        while self.size < target:
+            n = min(BATCH_SIZE, target - self.size)
+            positions = range(self.size, self.size + n)
+            documents = [f"doc-{p // self.chunks_per_document}" for p in positions]
+            ids = [f"{document}:{p % self.chunks_per_document}" for document, p in zip(documents, positions)]
+            texts = self.texts(n)
+            metadatas = [
+                {"document_id": document, "filename": f"{document}.txt", "chunk_index": p % self.chunks_per_document}
+                for document, p in zip(documents, positions)
+            ]
+            embeddings = self.rng.standard_normal((n, DIMENSIONS)).astype(np.float32)
+            embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+            rag_service._add_batch(ids, texts, metadatas, embeddings.tolist())
+            if rag_service.keyword_index is not None:
+                rag_service.keyword_index.add(ids, texts, documents)
+            self.size += n
+        rag_service._bump_version()
+
+async def measure(corpus: Corpus, args, offset: int, document_ids=None):
+    latencies = []
+    for i in range(args.queries):
+        # Distinct queries so neither the embedding nor the result cache answers them
+        query = f"{corpus.query(offset + i)} q{offset + i}"
+        started = time.perf_counter()
+        results = await rag_service.search(query, k=args.k, document_ids=document_ids)
+        latencies.append(time.perf_counter() - started)
+        if document_ids is not None:
+            outside = {r["metadata"]["document_id"] for r in results} - set(document_ids)
+            assert not outside, f"scoped search returned chunks from {outside}"
+    return latencies
+
+async def run(args):
+    rag_service.embeddings = RandomEmbeddings()
+    rag_service.embedding_store = EmbeddingStore(os.path.join(_workdir, "embedding_cache"), "random")
+    await rag_service.warmup()
+
+    corpus = Corpus(args)
+    scope = [f"doc-{i}" for i in range(args.scoped_documents)]
+    corpus.grow(args.scoped_documents * args.chunks_per_document)
+
+    mode = "hybrid" if rag_service.keyword_index is not None else "vector"
+    print(f"{mode} search, k={args.k}, scope {len(scope)} documents ({len(scope) * args.chunks_per_document} chunks)")
+    for size in sorted(args.sizes):
+        started = time.perf_counter()
+        corpus.grow(size)
+        build = time.perf_counter() - started
+
+        unscoped = await measure(corpus, args, offset=size)
+        scoped = await measure(corpus, args, offset=size + args.queries, document_ids=scope)
+        print(
+            f"{size:>9} chunks (+{build:5.1f}s to grow): "
+            f"all p50 {statistics.median(unscoped) * 1000:6.2f} ms  p99 {percentile(unscoped, 99) * 1000:6.2f} ms  |  "
+            f"scoped p50 {statistics.median(scoped) * 1000:6.2f} ms  p99 {percentile(scoped, 99) * 1000:6.2f} ms"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 50_000, 100_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--scoped-documents", type=int, default=5)
+    parser.add_argument("--chunks-per-document", type=int, default=100)
+    parser.add_argument("--vocabulary", type=int, default=20_000)
+    parser.add_argument("--words-per-chunk", type=int, default=120)
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""Offline load test of the chat and upload endpoints, with regression checks
+against a stored baseline.
+
+The LLM, embedding model and web search are replaced with deterministic local
+stand-ins - a token streamer running at a fixed rate, hashed bag-of-words
+embeddings and the stub search backend - so the run needs no network and no
+API keys, and the numbers reflect only how the service itself schedules work.
+/api/chat/stream, /api/chat/ and /api/documents/upload are driven
+concurrently; each workload reports throughput and p50/p95/p99 latency, the
+stream also time to first token, uploads also time until ingestion completes,
+chats the median of each server-side stage from their timings, and the run
+reports peak memory:
+
+    python -m benchmarks.load_test --concurrency 16 --requests 200
+    python -m benchmarks.load_test --save-baseline benchmarks/baselines/load_test.json
+    python -m benchmarks.load_test --baseline benchmarks/baselines/load_test.json
+
+With --baseline the exit status is 1 if any workload's throughput drops, or
+its p95 latency or peak memory grows, by more than --tolerance. Baselines are
+only comparable on the machine and settings they were recorded with.
+"""
+import argparse
+import asyncio
+import atexit
+import hashlib
+import json
+import math
+import os
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+# Settings read the environment at import, so the scratch directory has to exist before the app is imported
+_workdir = tempfile.mkdtemp(prefix="fyora-load-")
+atexit.register(shutil.rmtree, _workdir, ignore_errors=True)
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{_workdir}/chat.db")
+os.environ.setdefault("CHROMA_PERSIST_DIR", os.path.join(_workdir, "chroma_db"))
+os.environ.setdefault("UPLOAD_DIR", os.path.join(_workdir, "uploads"))
+os.environ.setdefault("WEB_SEARCH_BACKEND", "stub")
+# The rate limit protects DuckDuckGo; left on, it alone would set chat latency here
+os.environ.setdefault("WEB_SEARCH_RATE", "0")
+# The LLM client is constructed at import but never called
+os.environ.setdefault("OPENAI_API_KEY", "offline")
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+import httpx
+from langchain_core.embeddings import Embeddings
+from app.main import app, lifespan
+from app.services.embedding_store import EmbeddingStore
+from app.services.llm_service import llm_service
+from app.services.rag_service import rag_service
+from app.services.search_service import StubSearchBackend, search_service
+
+WORDS = (
+    "index query vector token latency stream batch cache document chunk embedding "
+    "thread message search context prompt answer model server request response"
+).split()
+
+class HashedEmbeddings(Embeddings):
+    """Deterministic bag-of-words embeddings: each word hashes to a signed dimension"""
+
+    def __init__(self, size: int = 384, latency: float = 0.0):
+        self.size = size
+        self.latency = latency
+
+    def _vector(self, text: str):
+        vector = [0.0] * self.size
+        for word in text.lower().split():
+            digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], "little") % self.size
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts):
+        if self.latency:
+            time.sleep(self.latency * (1 + 0.1 * (len(texts) - 1)))
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+class FakeLLM:
+    """Streams a fixed number of tokens at a fixed rate, like a remote LLM under no load"""
+
+    def __init__(self, tokens_per_second: float, output_tokens: int):
+        self.interval = 1 / tokens_per_second if tokens_per_second > 0 else 0.0
+        self.output_tokens = output_tokens
+
+    async def generate_stream(self, prompt):
+        for i in range(self.output_tokens):
+            await asyncio.sleep(self.interval)
+            yield WORDS[i % len(WORDS)] + " "
+
+    async def generate_response(self, prompt):
+        await asyncio.sleep(self.interval * self.output_tokens)
+        return "".join(WORDS[i % len(WORDS)] + " " for i in range(self.output_tokens))
+
+    async def generate_title(self, first_message):
+        return "Load test"
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def rss_mib() -> float:
+    """Current resident set size, from /proc where available"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return peak_rss_mib()
+
+def peak_rss_mib() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+def summarize(latencies, elapsed, errors):
+    if not latencies:
+        return {"requests": 0, "errors": errors}
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1)
+    }
+
+def document_text(seed: int, kilobytes: int) -> str:
+    words = []
+    size = 0
+    i = seed
+    while size < kilobytes * 1024:
+        word = f"{WORDS[i % len(WORDS)]}{i % 997}"
+        words.append(word)
+        size += len(word) + 1
+        i = (i * 31 + 7) % 100_003
+    return f"Load test document {seed}. " + " ".join(words)
+
+async def run_workload(name, count, concurrency, request):
+    """Issue count requests with at most concurrency in flight, collecting latencies per metric"""
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = {}
+    errors = 0
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            try:
+                for metric, seconds in (await request(i)).items():
+                    samples.setdefault(metric, []).append(seconds)
+            except Exception as e:
+                errors += 1
+                if errors == 1:
+                    print(f"{name} error: {e or type(e).__name__}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    elapsed = time.perf_counter() - started
+    return {metric: summarize(values, elapsed, errors) for metric, values in samples.items()} or {
+        name: summarize([], elapsed, errors)
+    }
+
+async def run(args):
+    rag_service.embeddings = HashedEmbeddings(latency=args.embed_latency)
+    rag_service.embedding_store = EmbeddingStore(os.path.join(_workdir, "embedding_cache"), "hashed-384")
+    search_service.backend = StubSearchBackend(latency=args.search_latency)
+    fake = FakeLLM(args.tokens_per_second, args.output_tokens)
+    llm_service.generate_stream = fake.generate_stream
+    llm_service.generate_response = fake.generate_response
+    llm_service.generate_title = fake.generate_title
+
+    stages = {}
+
+    def record_stages(name, timings):
+        for stage, value in (timings or {}).items():
+            if stage.endswith("_ms"):
+                stages.setdefault(name, {}).setdefault(stage[:-3], []).append(value)
+
+    async with lifespan(app):
+        while not app.state.ready:
+            if app.state.warmup_error:
+                raise RuntimeError(f"Warmup failed: {app.state.warmup_error}")
+            await asyncio.sleep(0.05)
+
+        for i in range(args.corpus_documents):
+            await rag_service.add_documents(
+                document_text(i, args.upload_kb),
+                {"document_id": f"corpus-{i}", "filename": f"corpus-{i}.txt", "file_type": "txt"}
+            )
+        rss_before = rss_mib()
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=None) as client:
+            threads = [
+                (await client.post("/api/threads/", json={"title": f"load {i}"})).json()["id"]
+                for i in range(args.threads)
+            ]
+
+            def chat_body(i):
+                return {
+                    "message": f"question {i} about {WORDS[i % len(WORDS)]} and {WORDS[(i * 7) % len(WORDS)]}",
+                    "thread_id": threads[i % len(threads)],
+                    "enable_web_search": args.web_search
+                }
+
+            async def stream(i):
+                started = time.perf_counter()
+                response = await client.post("/api/chat/stream", json=chat_body(i))
+                response.raise_for_status()
+                elapsed = time.perf_counter() - started
+                done = None
+                for line in response.text.splitlines():
+                    if line.startswith("data:") and '"done"' in line:
+                        done = json.loads(line[5:])
+                if done is None:
+                    raise RuntimeError("stream ended without a done event")
+                record_stages("stream", done.get("timings"))
+                first_token_ms = done.get("timings", {}).get("first_token_ms")
+                result = {"stream": elapsed}
+                if first_token_ms is not None:
+                    result["stream_first_token"] = first_token_ms / 1000
+                return result
+
+            async def chat(i):
+                started = time.perf_counter()
+                response = await client.post("/api/chat/", json=chat_body(args.requests + i))
+                response.raise_for_status()
+                elapsed = time.perf_counter() - started
+                record_stages("chat", response.json().get("timings"))
+                return {"chat": elapsed}
+
+            async def upload(i):
+                started = time.perf_counter()
+                files = {"file": (f"load-{i}.txt", document_text(args.corpus_documents + i, args.upload_kb), "text/plain")}
+                response = await client.post("/api/documents/upload", files=files)
+                response.raise_for_status()
+                uploaded = time.perf_counter() - started
+                document_id = response.json()["id"]
+                while True:
+                    status = (await client.get(f"/api/documents/{document_id}/status")).json()["status"]
+                    if status in ("completed", "failed"):
+                        break
+                    await asyncio.sleep(0.05)
+                if status == "failed":
+                    raise RuntimeError(f"ingestion of {document_id} failed")
+                return {"upload": uploaded, "upload_ingested": time.perf_counter() - started}
+
+            workloads = [
+                ("stream", args.requests, stream),
+                ("chat", args.requests, chat),
+                ("upload", args.uploads, upload)
+            ]
+            started = time.perf_counter()
+            outcomes = await asyncio.gather(*(
+                run_workload(name, count, args.concurrency, request)
+                for name, count, request in workloads if count > 0
+            ))
+            elapsed = time.perf_counter() - started
+
+    results = {}
+    for outcome in outcomes:
+        results.update(outcome)
+    for name, values in stages.items():
+        results[f"{name}_stages_p50_ms"] = {stage: round(statistics.median(v), 1) for stage, v in values.items()}
+    results["memory"] = {
+        "rss_before_mib": round(rss_before, 1),
+        "rss_after_mib": round(rss_mib(), 1),
+        "peak_rss_mib": round(peak_rss_mib(), 1)
+    }
+    results["elapsed_s"] = round(elapsed, 2)
+    return results
+
+def report(results):
+    for name, stats in results.items():
+        if not isinstance(stats, dict) or "requests" not in stats:
+            continue
+        if not stats["requests"]:
+            print(f"{name:>18}: no successful requests, {stats['errors']} errors")
+            continue
+        print(
+            f"{name:>18}: {stats['requests']:5d} ok  {stats['throughput']:7.1f} req/s  "
+            f"p50 {stats['p50_ms']:8.1f} ms  p95 {stats['p95_ms']:8.1f} ms  p99 {stats['p99_ms']:8.1f} ms  "
+            f"errors {stats['errors']}"
+        )
+    for name, medians in results.items():
+        if name.endswith("_stages_p50_ms"):
+            breakdown = "  ".join(f"{stage} {value:.1f}" for stage, value in medians.items())
+            print(f"{name[:-len('_stages_p50_ms')] + ' stages':>18}: p50 ms  {breakdown}")
+    memory = results["memory"]
+    print(
+        f"{'memory':>18}: rss {memory['rss_before_mib']:.1f} -> {memory['rss_after_mib']:.1f} MiB  "
+        f"peak {memory['peak_rss_mib']:.1f} MiB  (run took {results['elapsed_s']:.1f}s)"
+    )
+
+def compare(results, baseline, tolerance):
+    """Regressions of results against a baseline, as printable lines"""
+    regressions = []
+    for name, stats in baseline["results"].items():
+        current = results.get(name)
+        if not isinstance(stats, dict) or not isinstance(current, dict):
+            continue
+        checks = [("throughput", -1), ("p95_ms", 1), ("peak_rss_mib", 1)]
+        for metric, direction in checks:
+            if metric not in stats or metric not in current or not stats[metric]:
+                continue
+            change = (current[metric] - stats[metric]) / stats[metric]
+            if change * direction > tolerance:
+                regressions.append(f"{name} {metric}: {stats[metric]} -> {current[metric]} ({change:+.0%})")
+        if current.get("errors", 0) > stats.get("errors", 0):
+            regressions.append(f"{name} errors: {stats.get('errors', 0)} -> {current['errors']}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100, help="requests to each chat endpoint")
+    parser.add_argument("--uploads", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=16, help="in-flight requests per endpoint")
+    parser.add_argument("--threads", type=int, default=8, help="conversation threads to spread chats over")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--output-tokens", type=int, default=100)
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="extra seconds per embedding call")
+    parser.add_argument("--search-latency", type=float, default=0.05, help="seconds per stub web search")
+    parser.add_argument("--no-web-search", dest="web_search", action="store_false")
+    parser.add_argument("--corpus-documents", type=int, default=20, help="documents indexed before the run")
+    parser.add_argument("--upload-kb", type=int, default=32)
+    parser.add_argument("--baseline", help="compare against this baseline file")
+    parser.add_argument("--save-baseline", help="write the results to this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    report(results)
+
+    config = {key: value for key, value in vars(args).items() if key not in ("baseline", "save_baseline", "tolerance")}
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.save_baseline) or ".", exist_ok=True)
+        with open(args.save_baseline, "w") as f:
+            json.dump({"config": config, "results": results}, f, indent=2)
+            f.write("\n")
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            print("Warning: baseline was recorded with different settings")
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} of {args.baseline}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+# Point the app's stores at a scratch directory before any test imports its settings
+_workdir = tempfile.mkdtemp(prefix="fyora-tests-")
+atexit.register(shutil.rmtree, _workdir, ignore_errors=True)
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_workdir}/chat.db"
+os.environ["CHROMA_PERSIST_DIR"] = os.path.join(_workdir, "chroma_db")
+os.environ["UPLOAD_DIR"] = os.path.join(_workdir, "uploads")
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
@@ -0,0 +1,60 @@
+import numpy as np
+from app.services import answer_cache as module
+from app.services.answer_cache import AnswerCache
+
+RAG = [{"metadata": {"document_id": "d1", "chunk_index": 0}}]
+WEB = [{"url": "https://example.com"}]
+
+def rotated(angle: float):
+    return [float(np.cos(angle)), float(np.sin(angle)), 0.0]
+
+def test_similar_query_with_same_context_hits():
+    answers = AnswerCache(threshold=0.95)
+    context = AnswerCache.context_key(RAG, WEB)
+    answers.set(rotated(0), context, "cached answer")
+    # cos(0.2) ~ 0.98, cos(0.4) ~ 0.92
+    assert answers.get(rotated(0.2), context) == "cached answer"
+    assert answers.get(rotated(0.4), context) is None
+    assert answers.stats()["hits"] == 1
+    assert answers.stats()["misses"] == 1
+
+def test_most_similar_answer_wins():
+    answers = AnswerCache(threshold=0.9)
+    context = AnswerCache.context_key(RAG, [])
+    answers.set(rotated(0), context, "first")
+    answers.set(rotated(0.3), context, "second")
+    assert answers.get(rotated(0.25), context) == "second"
+
+def test_different_context_never_matches():
+    answers = AnswerCache(threshold=0.5)
+    answers.set(rotated(0), AnswerCache.context_key(RAG, WEB), "answer")
+    changed = [{"metadata": {"document_id": "d1", "chunk_index": 1}}]
+    assert answers.get(rotated(0), AnswerCache.context_key(changed, WEB)) is None
+    assert answers.get(rotated(0), AnswerCache.context_key(RAG, [])) is None
+
+def test_expired_answers_are_dropped(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(module.time, "monotonic", lambda: now[0])
+    answers = AnswerCache(ttl=10)
+    context = AnswerCache.context_key(RAG, [])
+    answers.set(rotated(0), context, "answer")
+    now[0] += 11
+    assert answers.get(rotated(0), context) is None
+    assert len(answers) == 0
+
+def test_eviction_and_clear_invalidate():
+    answers = AnswerCache(maxsize=2)
+    contexts = [AnswerCache.context_key([{"metadata": {"document_id": f"d{i}", "chunk_index": 0}}], []) for i in range(3)]
+    for i, context in enumerate(contexts):
+        answers.set(rotated(0), context, f"answer {i}")
+    assert answers.get(rotated(0), contexts[0]) is None
+    assert answers.get(rotated(0), contexts[2]) == "answer 2"
+
+    answers.clear()
+    assert len(answers) == 0
+    assert answers.get(rotated(0), contexts[2]) is None
+
+def test_empty_answers_are_not_cached():
+    answers = AnswerCache()
+    answers.set(rotated(0), frozenset(), "")
+    assert len(answers) == 0
@@ -0,0 +1,86 @@
+import json
+import os
+from app.services.bm25_index import BM25Index
+
+def ids(results):
+    return [chunk_id for chunk_id, _ in results]
+
+def test_add_and_search(tmp_path):
+    index = BM25Index(str(tmp_path))
+    index.add(["a:0", "a:1", "b:0"], ["error ERR_42 in parser", "parser works", "unrelated text"], ["a", "a", "b"])
+    assert len(index) == 3
+    assert ids(index.search("ERR_42")) == ["a:0"]
+    assert set(ids(index.search("parser"))) == {"a:0", "a:1"}
+    assert index.search("missing") == []
+
+def test_readding_a_chunk_replaces_it(tmp_path):
+    index = BM25Index(str(tmp_path))
+    index.add(["a:0"], ["first version"], ["a"])
+    index.add(["a:0"], ["second version"], ["a"])
+    assert len(index) == 1
+    assert index.search("first") == []
+    assert ids(index.search("second")) == ["a:0"]
+
+def test_delete_document_uses_document_ids_not_chunk_ids(tmp_path):
+    index = BM25Index(str(tmp_path))
+    # Chunks stored before ids carried their document have plain uuid ids
+    index.add(["3f1c", "9a2e", "b:0"], ["apple pie", "apple tart", "banana bread"], ["a", "a", "b"])
+    assert set(ids(index.search("apple", document_ids=["a"]))) == {"3f1c", "9a2e"}
+    assert index.delete_document("a") == 2
+    assert len(index) == 1
+    assert index.search("apple pie") == []
+    assert ids(index.search("banana")) == ["b:0"]
+
+def test_scoped_search_only_returns_scope(tmp_path):
+    index = BM25Index(str(tmp_path))
+    index.add(["a:0", "b:0", "c:0"], ["shared term", "shared term", "shared term"], ["a", "b", "c"])
+    assert set(ids(index.search("shared", document_ids=["a", "c"]))) == {"a:0", "c:0"}
+    assert index.search("shared", document_ids=["missing"]) == []
+
+def test_reload_restores_chunks_documents_and_deletions(tmp_path):
+    index = BM25Index(str(tmp_path))
+    for batch in range(5):
+        index.add([f"d{batch}:{i}" for i in range(3)], [f"word{batch} common {i}" for i in range(3)], [f"d{batch}"] * 3)
+    index.delete_document("d1")
+    expected = index.search("common", k=20)
+
+    reloaded = BM25Index(str(tmp_path))
+    assert len(reloaded) == 12
+    assert reloaded.search("common", k=20) == expected
+    assert reloaded.search("word1") == []
+    assert set(ids(reloaded.search("common", k=20, document_ids=["d3"]))) == {"d3:0", "d3:1", "d3:2"}
+
+def test_old_format_is_discarded_for_rebuild(tmp_path):
+    index = BM25Index(str(tmp_path))
+    index.add(["a:0"], ["text"], ["a"])
+    manifest_path = os.path.join(str(tmp_path), "manifest.json")
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    del manifest["format"]
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f)
+
+    reloaded = BM25Index(str(tmp_path))
+    assert len(reloaded) == 0
+    reloaded.add(["a:0"], ["text"], ["a"])
+    assert ids(BM25Index(str(tmp_path)).search("text")) == ["a:0"]
+
+def test_clear(tmp_path):
+    index = BM25Index(str(tmp_path))
+    index.add(["a:0"], ["text"], ["a"])
+    index.clear()
+    assert len(index) == 0
+    assert len(BM25Index(str(tmp_path))) == 0
+
+def test_two_instances_sharing_a_directory_keep_each_others_writes(tmp_path):
+    first, second = BM25Index(str(tmp_path)), BM25Index(str(tmp_path))
+    first.add(["a:0"], ["apple pie"], ["a"])
+    second.add(["b:0"], ["banana bread"], ["b"])
+    first.add(["c:0"], ["cherry tart"], ["c"])
+    assert ids(second.search("apple")) == ["a:0"]
+    assert second.delete_document("c") == 1
+    reopened = BM25Index(str(tmp_path))
+    assert len(reopened) == 2
+    assert {ids(reopened.search(term))[0] for term in ("apple", "banana")} == {"a:0", "b:0"}
+    assert reopened.search("cherry") == []
+    assert first.search("cherry") == []
@@ -0,0 +1,67 @@
+from app.utils import cache
+from app.utils.cache import TTLCache
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    entries = TTLCache(maxsize=10, ttl=5)
+    entries.set("a", 1)
+    clock.now += 4.9
+    assert entries.get("a") == 1
+    clock.now += 0.2
+    assert entries.get("a") is None
+    assert len(entries) == 0
+    assert entries.stats()["hits"] == 1
+    assert entries.stats()["misses"] == 1
+
+def test_least_recently_used_is_evicted():
+    entries = TTLCache(maxsize=2)
+    entries.set("a", 1)
+    entries.set("b", 2)
+    entries.get("a")
+    entries.set("c", 3)
+    assert entries.get("b") is None
+    assert entries.get("a") == 1
+    assert entries.get("c") == 3
+
+def test_zero_size_caches_nothing():
+    entries = TTLCache(maxsize=0)
+    entries.set("a", 1)
+    assert entries.get("a", "default") == "default"
+
+def test_pop_and_clear():
+    entries = TTLCache()
+    entries.set("a", 1)
+    entries.set("b", 2)
+    entries.pop("a")
+    entries.pop("missing")
+    assert entries.get("a") is None
+    entries.clear()
+    assert len(entries) == 0
+
+def test_weighted_entries_are_bounded_by_total_weight():
+    entries = TTLCache(maxsize=10, weigh=len)
+    entries.set("a", "x" * 4)
+    entries.set("b", "x" * 4)
+    entries.set("c", "x" * 4)
+    assert entries.get("a") is None
+    assert entries.weight == 8
+
+    entries.set("b", "x")
+    assert entries.weight == 5
+    entries.pop("c")
+    assert entries.weight == 1
+
+def test_entry_heavier_than_the_cache_is_not_stored():
+    entries = TTLCache(maxsize=3, weigh=len)
+    entries.set("small", "xx")
+    entries.set("huge", "x" * 4)
+    assert entries.get("huge") is None
+    assert entries.get("small") == "xx"
@@ -0,0 +1,88 @@
+import asyncio
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import select
+from app.config import settings
+from app.database import async_session, engine, init_db
+from app.models import Message, Thread
+from app.routers import chat
+from app.services.llm_service import llm_service
+from app.services.message_writer import message_writer
+from app.utils import background
+
+def fake_llm(monkeypatch, chunks, fail: bool = False):
+    async def generate_stream(prompt):
+        for chunk in chunks:
+            await asyncio.sleep(0.01)
+            yield chunk
+        if fail:
+            raise ConnectionError("LLM connection dropped")
+
+    async def generate_title(first_message):
+        return "Stream test"
+
+    monkeypatch.setattr(llm_service, "generate_stream", generate_stream)
+    monkeypatch.setattr(llm_service, "generate_title", generate_title)
+    # Checkpoint after every chunk
+    monkeypatch.setattr(settings, "stream_checkpoint_interval", 0.0)
+
+async def assistant_messages(thread_id: str):
+    async with async_session() as db:
+        rows = await db.execute(
+            select(Message.content, Message.status).where(Message.thread_id == thread_id, Message.role == "assistant")
+        )
+        return rows.all()
+
+def stream_once(monkeypatch, chunks, fail: bool = False):
+    fake_llm(monkeypatch, chunks, fail)
+    app = FastAPI()
+    app.include_router(chat.router, prefix="/api")
+
+    async def run():
+        await init_db()
+        async with async_session() as db:
+            thread = Thread(title="New Conversation")
+            db.add(thread)
+            await db.commit()
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                request = {"message": "hello", "thread_id": thread.id, "enable_rag": False}
+                try:
+                    response = await client.post("/api/chat/stream", json=request)
+                    body = response.text
+                except Exception:
+                    # An LLM failure mid-stream breaks the response
+                    body = None
+            await background.drain()
+            await message_writer.drain()
+            return body, await assistant_messages(thread.id)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+def test_a_finished_stream_is_saved_complete(monkeypatch):
+    body, messages = stream_once(monkeypatch, ["Hello ", "there ", "friend."])
+    assert '"done": true' in body
+    assert messages == [("Hello there friend.", "complete")]
+
+def test_an_interrupted_stream_keeps_its_partial_response(monkeypatch):
+    _, messages = stream_once(monkeypatch, ["Half ", "an "], fail=True)
+    assert messages == [("Half an ", "aborted")]
+
+def test_responses_left_streaming_are_marked_aborted_on_startup():
+    async def run():
+        await init_db()
+        try:
+            async with async_session() as db:
+                thread = Thread(title="crashed")
+                db.add(thread)
+                await db.flush()
+                db.add(Message(thread_id=thread.id, role="assistant", content="partial", status="streaming"))
+                await db.commit()
+            await message_writer.abort_interrupted()
+            return await assistant_messages(thread.id)
+        finally:
+            await engine.dispose()
+
+    assert asyncio.run(run()) == [("partial", "aborted")]
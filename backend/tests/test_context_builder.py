@@ -0,0 +1,70 @@
+from langchain_core.messages import SystemMessage
+from app.services.context_builder import MESSAGE_OVERHEAD, SUMMARY_HEADER, ContextBuilder
+
+def turns(n, words=40):
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"turn {i} " + "lorem ipsum " * words}
+        for i in range(n)
+    ]
+
+def test_truncate_respects_budget():
+    builder = ContextBuilder()
+    text = "alpha beta gamma " * 200
+    assert builder.truncate(text, 0) == ""
+    assert builder.truncate("short", 100) == "short"
+    truncated = builder.truncate(text, 20)
+    assert truncated.endswith("...")
+    assert builder.count(truncated[:-3]) <= 20
+
+def test_build_stays_within_budget():
+    builder = ContextBuilder(max_tokens=1000)
+    prompt = builder.build(
+        "You are helpful.",
+        "What changed?",
+        chat_history=turns(30),
+        rag_context=[{"source": f"doc{i}.pdf", "content": "context words " * 300} for i in range(5)],
+        web_context=[{"title": "Result", "snippet": "web words " * 300}]
+    )
+    assert prompt.token_counts["total"] <= 1000
+    assert prompt.token_counts["total"] == sum(v for k, v in prompt.token_counts.items() if k != "total")
+
+def test_context_keeps_best_ranked_results_first():
+    builder = ContextBuilder(max_tokens=500, context_share=0.5)
+    rag_context = [{"source": f"doc{i}.pdf", "content": "context words " * 200} for i in range(5)]
+    prompt = builder.build("system", "question", rag_context=rag_context)
+    assert "[Doc 1] doc0.pdf" in prompt.context
+    assert "[Doc 5]" not in prompt.context
+    assert prompt.token_counts["total"] <= 500
+
+def test_history_keeps_newest_turns_and_summarizes_the_rest():
+    builder = ContextBuilder(max_tokens=800, max_history_messages=50, summary_tokens=100)
+    history = turns(20)
+    prompt = builder.build("system", "question", chat_history=history)
+
+    summary, kept = prompt.history[0], prompt.history[1:]
+    assert isinstance(summary, SystemMessage)
+    assert summary.content.startswith(SUMMARY_HEADER)
+    assert builder.count(summary.content) <= 100 - MESSAGE_OVERHEAD
+    assert kept, "the newest turns should still fit"
+    assert [m.content for m in kept] == [t["content"] for t in history[-len(kept):]]
+
+def test_full_history_fits_without_summary():
+    builder = ContextBuilder(max_tokens=6000)
+    history = turns(4, words=5)
+    prompt = builder.build("system", "question", chat_history=history)
+    assert [m.content for m in prompt.history] == [t["content"] for t in history]
+    assert not any(isinstance(m, SystemMessage) for m in prompt.history)
+
+def test_previous_summary_is_carried_forward():
+    builder = ContextBuilder(max_tokens=6000)
+    previous = f"{SUMMARY_HEADER}\n- User: an earlier question"
+    prompt = builder.build("system", "question", chat_history=turns(2, words=5), history_summary=previous)
+    assert isinstance(prompt.history[0], SystemMessage)
+    assert "- User: an earlier question" in prompt.history[0].content
+
+def test_summary_drops_oldest_lines_to_fit():
+    builder = ContextBuilder()
+    previous = SUMMARY_HEADER + "".join(f"\n- User: old line {i} " + "words " * 20 for i in range(20))
+    summary = builder.summarize(turns(3), 60, previous=previous)
+    assert builder.count(summary) <= 60
+    assert "old line 0 " not in summary
@@ -0,0 +1,52 @@
+import asyncio
+import os
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import update
+from app.config import settings
+from app.database import async_session, engine, init_db
+from app.models import Document
+from app.routers import documents
+from app.services.ingestion_service import ingestion_service
+
+def upload_twice(monkeypatch, content: bytes, fail_first: bool = False):
+    app = FastAPI()
+    app.include_router(documents.router, prefix="/api")
+    queued = []
+
+    async def enqueue(document_id):
+        queued.append(document_id)
+
+    monkeypatch.setattr(ingestion_service, "enqueue", enqueue)
+
+    async def run():
+        await init_db()
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                first = await client.post("/api/documents/upload", files={"file": ("notes.txt", content)})
+                if fail_first:
+                    async with async_session() as db:
+                        await db.execute(update(Document).where(Document.id == first.json()["id"]).values(status="failed"))
+                        await db.commit()
+                second = await client.post("/api/documents/upload", files={"file": ("copy.txt", content)})
+                return first, second
+        finally:
+            await engine.dispose()
+
+    first, second = asyncio.run(run())
+    return first, second, queued
+
+def test_an_identical_upload_returns_the_existing_document(monkeypatch):
+    first, second, queued = upload_twice(monkeypatch, b"the same notes twice")
+    assert first.status_code == 202
+    assert second.status_code == 200
+    assert second.json()["id"] == first.json()["id"]
+    assert queued == [first.json()["id"]]
+    # Only the first copy stays on disk
+    assert [name for name in os.listdir(settings.upload_dir) if name.endswith("copy.txt")] == []
+
+def test_a_failed_document_does_not_block_a_new_upload(monkeypatch):
+    first, second, queued = upload_twice(monkeypatch, b"notes that failed to ingest", fail_first=True)
+    assert second.status_code == 202
+    assert second.json()["id"] != first.json()["id"]
+    assert queued == [first.json()["id"], second.json()["id"]]
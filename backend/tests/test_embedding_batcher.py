@@ -0,0 +1,39 @@
+import asyncio
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.utils.metrics import EMBEDDING_BATCH_SIZE, EMBEDDING_QUEUE_SECONDS
+
+def count(histogram) -> int:
+    return int(histogram.samples()[-1].split()[-1]) if histogram.samples() else 0
+
+def test_concurrent_texts_share_one_batch_and_are_observed():
+    calls = []
+
+    async def embed_batch(texts):
+        calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+    async def run():
+        batcher = EmbeddingBatcher(embed_batch, max_batch_size=8, max_wait_ms=5)
+        return batcher, await asyncio.gather(*(batcher.embed(text) for text in ("a", "bb", "a", "ccc")))
+
+    batches, queued = count(EMBEDDING_BATCH_SIZE), count(EMBEDDING_QUEUE_SECONDS)
+    batcher, vectors = asyncio.run(run())
+    assert vectors == [[1.0], [2.0], [1.0], [3.0]]
+    assert calls == [["a", "bb", "ccc"]]
+    assert batcher.stats()["batches"] == 1
+    assert count(EMBEDDING_BATCH_SIZE) == batches + 1
+    assert count(EMBEDDING_QUEUE_SECONDS) == queued + 4
+
+def test_a_full_batch_is_sent_without_waiting():
+    calls = []
+
+    async def embed_batch(texts):
+        calls.append(list(texts))
+        return [[0.0] for _ in texts]
+
+    async def run():
+        batcher = EmbeddingBatcher(embed_batch, max_batch_size=2, max_wait_ms=10_000)
+        await asyncio.wait_for(asyncio.gather(batcher.embed("a"), batcher.embed("b")), timeout=1)
+
+    asyncio.run(run())
+    assert calls == [["a", "b"]]
@@ -0,0 +1,40 @@
+import hashlib
+from app.services.embedding_store import EmbeddingStore
+
+def sha(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def test_put_and_reload(tmp_path):
+    store = EmbeddingStore(str(tmp_path), "model")
+    store.put_many({sha("one"): [1.0, 1.0], sha("two"): [2.0, 2.0]})
+    store.put_many({sha("one"): [9.0, 9.0]})
+    assert store.get_many([sha("one"), sha("missing")]) == {sha("one"): [1.0, 1.0]}
+
+    reloaded = EmbeddingStore(str(tmp_path), "model")
+    assert len(reloaded) == 2
+    assert reloaded.get_many([sha("two")]) == {sha("two"): [2.0, 2.0]}
+
+def test_stores_sharing_a_directory_keep_each_others_rows(tmp_path):
+    first = EmbeddingStore(str(tmp_path), "model")
+    second = EmbeddingStore(str(tmp_path), "model")
+    first.put_many({sha("one"): [1.0, 1.0]})
+    second.put_many({sha("two"): [2.0, 2.0]})
+    first.put_many({sha("two"): [7.0, 7.0], sha("three"): [3.0, 3.0]})
+
+    assert first.get_many([sha("one")]) == {sha("one"): [1.0, 1.0]}
+    assert second.get_many([sha("one"), sha("two"), sha("three")]) == {
+        sha("one"): [1.0, 1.0], sha("two"): [2.0, 2.0], sha("three"): [3.0, 3.0]
+    }
+    assert len(EmbeddingStore(str(tmp_path), "model")) == 3
+
+def test_partial_row_from_a_crash_is_ignored(tmp_path):
+    store = EmbeddingStore(str(tmp_path), "model")
+    store.put_many({sha("one"): [1.0, 1.0]})
+    with open(store.vectors_path, "ab") as f:
+        f.write(b"\0" * 4)
+
+    reloaded = EmbeddingStore(str(tmp_path), "model")
+    reloaded.put_many({sha("two"): [2.0, 2.0]})
+    assert EmbeddingStore(str(tmp_path), "model").get_many([sha("one"), sha("two")]) == {
+        sha("one"): [1.0, 1.0], sha("two"): [2.0, 2.0]
+    }
@@ -0,0 +1,102 @@
+import asyncio
+import os
+import uuid
+from sqlalchemy import select
+from app.config import settings
+from app.database import async_session, engine, init_db
+from app.models import Document
+from app.services.ingestion_service import IngestionService
+from app.services.rag_service import rag_service
+
+def write_upload(text: str) -> str:
+    path = os.path.join(settings.upload_dir, f"{uuid.uuid4()}_notes.txt")
+    with open(path, "w") as f:
+        f.write(text)
+    return path
+
+def fake_rag(monkeypatch, fail_on: str = None):
+    """Stand-ins for the vector store calls, recording (operation, document id) in order"""
+    calls = []
+
+    async def add_document_stream(segments, metadata, on_progress=None):
+        text = "".join([segment async for segment in segments])
+        calls.append(("add", metadata["document_id"]))
+        if fail_on and fail_on in text:
+            raise ValueError("embedding failed")
+        if on_progress:
+            on_progress(len(text.split()))
+        return len(text.split())
+
+    async def delete_document(document_id):
+        calls.append(("delete", document_id))
+
+    monkeypatch.setattr(rag_service, "add_document_stream", add_document_stream)
+    monkeypatch.setattr(rag_service, "delete_document", delete_document)
+    return calls
+
+async def add_documents(*documents: Document):
+    await init_db()
+    async with async_session() as db:
+        db.add_all(documents)
+        await db.commit()
+
+async def run_service(*uploaded: Document):
+    """Start a worker pool, then add and enqueue documents the way the upload endpoint does"""
+    service = IngestionService(workers=2)
+    await service.start()
+    await add_documents(*uploaded)
+    for document in uploaded:
+        await service.enqueue(document.id)
+    await service.queue.join()
+    await service.stop()
+
+async def statuses(ids):
+    async with async_session() as db:
+        rows = await db.execute(select(Document.id, Document.status, Document.chunk_count).where(Document.id.in_(ids)))
+        return {row.id: (row.status, row.chunk_count) for row in rows}
+
+def test_queued_documents_are_processed_and_failures_recorded(monkeypatch):
+    calls = fake_rag(monkeypatch, fail_on="broken")
+    good = Document(filename="good.txt", file_path=write_upload("three words here"), file_type="txt", status="pending")
+    bad = Document(filename="bad.txt", file_path=write_upload("a broken file"), file_type="txt", status="pending")
+
+    async def run():
+        try:
+            await init_db()
+            await run_service(good, bad)
+            return await statuses([good.id, bad.id])
+        finally:
+            await engine.dispose()
+
+    result = asyncio.run(run())
+    assert result[good.id] == ("completed", 3)
+    assert result[bad.id][0] == "failed"
+    # A failed document's partial vectors and file are removed
+    assert ("delete", bad.id) in calls
+    assert not os.path.exists(bad.file_path)
+    assert ("delete", good.id) not in calls
+
+def test_interrupted_documents_are_resumed_on_start(monkeypatch):
+    calls = fake_rag(monkeypatch)
+    interrupted = Document(filename="a.txt", file_path=write_upload("one two"), file_type="txt", status="processing")
+    pending = Document(filename="b.txt", file_path=write_upload("one"), file_type="txt", status="pending")
+    finished = Document(
+        filename="c.txt", file_path=write_upload("done"), file_type="txt", status="processing", processed=True
+    )
+
+    async def run():
+        try:
+            await add_documents(interrupted, pending, finished)
+            await run_service()
+            return await statuses([interrupted.id, pending.id, finished.id])
+        finally:
+            await engine.dispose()
+
+    result = asyncio.run(run())
+    assert result[interrupted.id] == ("completed", 2)
+    assert result[pending.id] == ("completed", 1)
+    assert result[finished.id] == ("completed", 0)
+    # Vectors from the interrupted attempt are dropped before it is embedded again
+    mine = [call for call in calls if call[1] == interrupted.id]
+    assert mine == [("delete", interrupted.id), ("add", interrupted.id)]
+    assert ("add", finished.id) not in calls
@@ -0,0 +1,62 @@
+import asyncio
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from app.database import async_session, engine, init_db
+from app.models import Message, Thread
+from app.services.message_writer import MessageWriter
+
+async def new_thread() -> str:
+    await init_db()
+    async with async_session() as db:
+        thread = Thread(title="writer test")
+        db.add(thread)
+        await db.commit()
+        return thread.id
+
+async def thread_messages(thread_id: str):
+    async with async_session() as db:
+        rows = await db.execute(select(Message.content, Message.status).where(Message.thread_id == thread_id))
+        return sorted(rows.all())
+
+def test_concurrent_writes_share_one_transaction():
+    async def run():
+        try:
+            thread_id = await new_thread()
+            writer = MessageWriter(async_session, max_batch_size=64, max_wait_ms=50)
+            ids = await asyncio.gather(*(
+                writer.add(thread_id=thread_id, role="user", content=f"message {i}") for i in range(10)
+            ))
+            await asyncio.gather(
+                writer.update(ids[0], content="partial", status="streaming"),
+                writer.update(ids[0], content="final", status="complete")
+            )
+            return writer, await thread_messages(thread_id)
+        finally:
+            await engine.dispose()
+
+    writer, messages = asyncio.run(run())
+    assert writer.batches == 2
+    assert writer.writes == 12
+    assert ("final", "complete") in messages
+    assert len(messages) == 10
+
+def test_a_failing_row_fails_only_its_own_write():
+    async def run():
+        try:
+            thread_id = await new_thread()
+            writer = MessageWriter(async_session, max_batch_size=64, max_wait_ms=50)
+            results = await asyncio.gather(
+                writer.add(thread_id=thread_id, role="user", content="first"),
+                writer.add(thread_id=thread_id, role="assistant", content=None),
+                writer.add(thread_id=thread_id, role="user", content="second"),
+                return_exceptions=True
+            )
+            return writer, results, await thread_messages(thread_id)
+        finally:
+            await engine.dispose()
+
+    writer, results, messages = asyncio.run(run())
+    assert writer.batches == 1
+    assert isinstance(results[1], IntegrityError)
+    assert isinstance(results[0], str) and isinstance(results[2], str)
+    assert messages == [("first", "complete"), ("second", "complete")]
@@ -0,0 +1,65 @@
+import pytest
+from app.utils.metrics import Counter, Gauge, Histogram, Metric, Registry
+
+def test_metric_is_abstract():
+    with pytest.raises(TypeError):
+        Metric("fyora_untyped", "No samples", registry=None)
+
+def test_histogram_exposition():
+    registry = Registry()
+    histogram = Histogram("fyora_test_seconds", "Test latency", ["stage"], buckets=(0.1, 1.0), registry=registry)
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value, stage="load")
+
+    assert registry.render().splitlines() == [
+        "# HELP fyora_test_seconds Test latency",
+        "# TYPE fyora_test_seconds histogram",
+        'fyora_test_seconds_bucket{stage="load",le="0.1"} 2',
+        'fyora_test_seconds_bucket{stage="load",le="1.0"} 3',
+        'fyora_test_seconds_bucket{stage="load",le="+Inf"} 4',
+        'fyora_test_seconds_sum{stage="load"} 2.65',
+        'fyora_test_seconds_count{stage="load"} 4',
+    ]
+
+def test_histogram_series_are_kept_per_label_set():
+    histogram = Histogram("fyora_test_seconds", "Test latency", ["stage"], buckets=(1.0,), registry=None)
+    histogram.observe(0.5, stage="a")
+    with histogram.time(stage="b"):
+        pass
+
+    lines = histogram.samples()
+    assert 'fyora_test_seconds_bucket{stage="a",le="1.0"} 1' in lines
+    assert 'fyora_test_seconds_bucket{stage="b",le="1.0"} 1' in lines
+    assert 'fyora_test_seconds_count{stage="a"} 1' in lines
+    assert 'fyora_test_seconds_count{stage="b"} 1' in lines
+
+def test_label_values_and_help_are_escaped():
+    registry = Registry()
+    counter = Counter("fyora_test_total", 'Help with \\ and\nnewline', ["path"], registry=registry)
+    counter.inc(path='a "quoted" \\ path\nline')
+
+    assert registry.render().splitlines() == [
+        "# HELP fyora_test_total Help with \\\\ and\\nnewline",
+        "# TYPE fyora_test_total counter",
+        'fyora_test_total{path="a \\"quoted\\" \\\\ path\\nline"} 1.0',
+    ]
+
+def test_counter_collect_and_gauge_set():
+    counter = Counter("fyora_test_total", "Collected", collect=lambda: {(): 7}, registry=None)
+    assert counter.samples() == ["fyora_test_total 7.0"]
+
+    gauge = Gauge("fyora_test_entries", "Entries", registry=None)
+    gauge.set(3)
+    gauge.set(1)
+    assert gauge.samples() == ["fyora_test_entries 1.0"]
+
+def test_labels_must_match():
+    counter = Counter("fyora_test_total", "Labelled", ["kind"], registry=None)
+    with pytest.raises(ValueError):
+        counter.inc(other="x")
+
+def test_duplicate_names_are_rejected():
+    registry = Registry()
+    Counter("fyora_test_total", "First", registry=registry)
+    with pytest.raises(ValueError):
+        Counter("fyora_test_total", "Second", registry=registry)
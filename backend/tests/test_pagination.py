@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+from fastapi import HTTPException, Response
+from sqlalchemy.ext.asyncio import async_sessionmaker
+import asyncio
+import pytest
+from app.database import Base, create_engine
+from app.models import Message, Thread
+from app.routers.threads import get_thread_messages, get_threads
+from app.utils.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+
+def test_cursor_round_trip():
+    timestamp = datetime(2024, 5, 1, 12, 30, 15, 123456)
+    cursor = encode_cursor(timestamp, "thread-1")
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (timestamp, "thread-1")
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", encode_cursor(datetime(2024, 1, 1), "x")[:-4]])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+async def _with_session(tmp_path, run):
+    engine = create_engine(f"sqlite+aiosqlite:///{tmp_path}/pages.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+            return await run(db)
+    finally:
+        await engine.dispose()
+
+async def _pages(fetch, limit):
+    pages, cursor = [], None
+    while True:
+        response = Response()
+        page = await fetch(response, limit, cursor)
+        pages.append(page)
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return pages
+
+def test_thread_pages_cover_every_thread_once(tmp_path):
+    async def run(db):
+        base = datetime(2024, 1, 1)
+        # Ties on updated_at are broken by id, so pages must not skip or repeat them
+        times = [base, base, base + timedelta(seconds=1), base + timedelta(seconds=1), base + timedelta(seconds=2)]
+        db.add_all([Thread(id=f"t{i}", updated_at=t) for i, t in enumerate(times)])
+        await db.commit()
+
+        pages = await _pages(lambda response, limit, cursor: get_threads(response, limit, cursor, db), 2)
+        return [[thread.id for thread in page] for page in pages]
+
+    pages = asyncio.run(_with_session(tmp_path, run))
+    assert pages == [["t4", "t3"], ["t2", "t1"], ["t0"]]
+
+def test_exact_page_has_no_next_cursor(tmp_path):
+    async def run(db):
+        db.add_all([Thread(id=f"t{i}") for i in range(3)])
+        await db.commit()
+        return await _pages(lambda response, limit, cursor: get_threads(response, limit, cursor, db), 3)
+
+    pages = asyncio.run(_with_session(tmp_path, run))
+    assert len(pages) == 1 and len(pages[0]) == 3
+
+def test_message_pages_go_back_in_time_in_chronological_order(tmp_path):
+    async def run(db):
+        base = datetime(2024, 1, 1)
+        db.add(Thread(id="t"))
+        db.add_all([
+            Message(id=f"m{i}", thread_id="t", role="user", content=str(i), created_at=base + timedelta(seconds=i))
+            for i in range(5)
+        ])
+        await db.commit()
+
+        pages = await _pages(lambda response, limit, cursor: get_thread_messages("t", response, limit, cursor, db), 2)
+        return [[message["id"] for message in page] for page in pages]
+
+    pages = asyncio.run(_with_session(tmp_path, run))
+    assert pages == [["m3", "m4"], ["m1", "m2"], ["m0"]]
@@ -0,0 +1,39 @@
+import chromadb
+import numpy as np
+import pytest
+from types import SimpleNamespace
+from app.services.rag_service import RAGService
+
+def make_service(tmp_path, space: str) -> RAGService:
+    client = chromadb.PersistentClient(path=str(tmp_path), settings=chromadb.Settings(anonymized_telemetry=False))
+    collection = client.create_collection("documents", metadata={"hnsw:space": space})
+    rng = np.random.default_rng(7)
+    vectors = rng.normal(size=(60, 16)).astype(np.float32)
+    collection.add(
+        ids=[f"doc-{i % 3}:{i}" for i in range(60)],
+        embeddings=vectors.tolist(),
+        documents=[f"chunk {i}" for i in range(60)],
+        metadatas=[{"document_id": f"doc-{i % 3}"} for i in range(60)]
+    )
+    service = RAGService()
+    service._vectorstore = SimpleNamespace(_collection=collection)
+    service._vectorstore_opened = True
+    return service
+
+@pytest.mark.parametrize("space", ["l2", "cosine", "ip"])
+def test_in_memory_scoped_distances_match_chroma(tmp_path, space):
+    service = make_service(tmp_path, space)
+    scope = ["doc-0", "doc-2"]
+    query = np.random.default_rng(11).normal(size=16).astype(np.float32).tolist()
+
+    expected = service._vector_hits(query, 8, scope)
+    documents = service._read_document_chunks(scope)
+    actual = service._nearest_chunks(list(documents.values()), query, 8)
+
+    assert [hit["id"] for hit in actual] == [hit["id"] for hit in expected]
+    assert all(hit["metadata"]["document_id"] in scope for hit in actual)
+    np.testing.assert_allclose(
+        [hit["distance"] for hit in actual],
+        [hit["distance"] for hit in expected],
+        rtol=1e-4, atol=1e-4
+    )
@@ -0,0 +1,74 @@
+import asyncio
+import time
+from app.services.search_service import SearchBackend, SearchService, StubSearchBackend, TokenBucket
+
+class FlakyBackend(SearchBackend):
+    def __init__(self):
+        self.calls = 0
+
+    def text(self, query, max_results):
+        self.calls += 1
+        if self.calls == 1:
+            raise ConnectionError("rate limited upstream")
+        return [{"title": query, "url": "https://example.com", "snippet": ""}]
+
+def test_identical_concurrent_queries_share_one_backend_call():
+    backend = StubSearchBackend(latency=0.05)
+    service = SearchService(backend)
+
+    async def run():
+        queries = ["Python asyncio", "python  asyncio", "PYTHON asyncio", "python asyncio"]
+        results = await asyncio.gather(*(service.search(query) for query in queries))
+        cached = await service.search("python asyncio")
+        return results, cached
+
+    try:
+        results, cached = asyncio.run(run())
+    finally:
+        service.executor.shutdown()
+    assert backend.calls == 1
+    assert service.deduplicated == 3
+    assert all(result == results[0] for result in results)
+    assert cached == results[0]
+    assert results[0][0]["source"] == "web_search"
+    assert service.stats()["inflight"] == 0
+
+def test_failed_searches_are_not_cached():
+    backend = FlakyBackend()
+    service = SearchService(backend)
+
+    async def run():
+        return await service.search("outage"), await service.search("outage")
+
+    try:
+        first, second = asyncio.run(run())
+    finally:
+        service.executor.shutdown()
+    assert first == []
+    assert [result["title"] for result in second] == ["outage"]
+    assert backend.calls == 2
+
+def test_token_bucket_spaces_calls_after_the_burst():
+    bucket = TokenBucket(rate=20, burst=2)
+
+    async def run():
+        started = time.perf_counter()
+        await asyncio.gather(*(bucket.acquire() for _ in range(2)))
+        burst = time.perf_counter() - started
+        await asyncio.gather(*(bucket.acquire() for _ in range(3)))
+        return burst, time.perf_counter() - started
+
+    burst, total = asyncio.run(run())
+    assert burst < 0.04
+    # Three calls past the burst wait for tokens at 20 per second
+    assert total >= 0.14
+
+def test_token_bucket_with_no_rate_never_waits():
+    bucket = TokenBucket(rate=0, burst=1)
+
+    async def run():
+        started = time.perf_counter()
+        await asyncio.gather(*(bucket.acquire() for _ in range(100)))
+        return time.perf_counter() - started
+
+    assert asyncio.run(run()) < 0.05
@@ -0,0 +1,52 @@
+from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi.testclient import TestClient
+from app.utils.uploads import save_upload, UploadLimitMiddleware, UploadTooLarge
+
+MAX_SIZE = 1024 * 1024
+
+def make_client(tmp_path):
+    app = FastAPI()
+    app.add_middleware(UploadLimitMiddleware, path_suffix="/upload", max_size=MAX_SIZE)
+    app.state.saved = []
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        path = str(tmp_path / file.filename)
+        try:
+            size, _ = await save_upload(file, path, MAX_SIZE)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        app.state.saved.append(file.filename)
+        return {"size": size}
+
+    return app, TestClient(app)
+
+def test_a_file_of_exactly_the_limit_is_accepted(tmp_path):
+    app, client = make_client(tmp_path)
+    response = client.post("/upload", files={"file": ("notes.txt", b"x" * MAX_SIZE)})
+    assert response.status_code == 200
+    assert response.json() == {"size": MAX_SIZE}
+
+def test_a_file_over_the_limit_is_rejected_and_removed(tmp_path):
+    app, client = make_client(tmp_path)
+    response = client.post("/upload", files={"file": ("notes.txt", b"x" * (MAX_SIZE + 1))})
+    assert response.status_code == 413
+    assert response.json()["detail"] == "File exceeds the 1 MB upload limit"
+    assert not (tmp_path / "notes.txt").exists()
+
+def test_a_body_far_over_the_limit_is_rejected_from_its_headers(tmp_path):
+    app, client = make_client(tmp_path)
+    response = client.post("/upload", files={"file": ("notes.txt", b"x" * (2 * MAX_SIZE))})
+    assert response.status_code == 413
+    assert app.state.saved == []
+
+def test_unsupported_extensions_are_rejected_before_the_body_is_spooled(tmp_path):
+    app, client = make_client(tmp_path)
+    response = client.post("/upload", files={"file": ("tool.exe", b"MZ" * 1000)})
+    assert response.status_code == 400
+    assert app.state.saved == []
+
+def test_non_multipart_bodies_are_rejected(tmp_path):
+    app, client = make_client(tmp_path)
+    response = client.post("/upload", content=b"plain", headers={"content-type": "text/plain"})
+    assert response.status_code == 415
@@ -6,6 +6,7 @@ import { api } from './services/api';
 
 function App() {
   const [threads, setThreads] = useState([]);
+  const [threadsCursor, setThreadsCursor] = useState(null);
   const [documents, setDocuments] = useState([]);
   const [currentThread, setCurrentThread] = useState(null);
   const [sidebarOpen, setSidebarOpen] = useState(false);
@@ -18,6 +19,8 @@ function App() {
     status, 
     sendMessage, 
     loadMessages, 
+    loadOlderMessages,
+    hasOlderMessages,
     clearMessages 
   } = useChat();
 
@@ -30,16 +33,29 @@ function App() {
   // Load threads
   const loadThreads = async () => {
     try {
-      const data = await api.getThreads();
-      setThreads(data);
-      if (data.length > 0 && !currentThread) {
-        selectThread(data[0]);
+      const { items, nextCursor } = await api.getThreads();
+      setThreads(items);
+      setThreadsCursor(nextCursor);
+      if (items.length > 0 && !currentThread) {
+        selectThread(items[0]);
       }
     } catch (error) {
       console.error('Error loading threads:', error);
     }
   };
 
+  // Load the next page of older threads
+  const loadMoreThreads = async () => {
+    if (!threadsCursor) return;
+    try {
+      const { items, nextCursor } = await api.getThreads(threadsCursor);
+      setThreads(prev => [...prev, ...items.filter(t => !prev.some(p => p.id === t.id))]);
+      setThreadsCursor(nextCursor);
+    } catch (error) {
+      console.error('Error loading more threads:', error);
+    }
+  };
+
   // Load documents
   const loadDocuments = async () => {
     try {
@@ -84,11 +100,34 @@ function App() {
     }
   };
 
+  // Poll a document's ingestion job until it finishes
+  const pollDocumentStatus = async (documentId) => {
+    while (true) {
+      await new Promise(resolve => setTimeout(resolve, 1000));
+      try {
+        const job = await api.getDocumentStatus(documentId);
+        setDocuments(prev => prev.map(d =>
+          d.id === documentId
+            ? { ...d, status: job.status, processed: job.processed, chunk_count: job.chunks_embedded }
+            : d
+        ));
+        if (job.status === 'completed' || job.status === 'failed') break;
+      } catch (error) {
+        console.error('Error polling document status:', error);
+        break;
+      }
+    }
+  };
+
   // Upload document
   const handleUploadDocument = async (file) => {
     try {
       const doc = await api.uploadDocument(file);
-      setDocuments(prev => [doc, ...prev]);
+      // A duplicate upload returns the existing document, which moves to the top instead of repeating
+      setDocuments(prev => [doc, ...prev.filter(d => d.id !== doc.id)]);
+      if (doc.status !== 'completed' && doc.status !== 'failed') {
+        pollDocumentStatus(doc.id);
+      }
     } catch (error) {
       console.error('Error uploading document:', error);
       alert(error.message);
@@ -134,6 +173,8 @@ function App() {
         documents={documents}
         currentThread={currentThread}
         onSelectThread={selectThread}
+        hasMoreThreads={threadsCursor !== null}
+        onLoadMoreThreads={loadMoreThreads}
         onNewThread={handleNewThread}
         onDeleteThread={handleDeleteThread}
         onUploadDocument={handleUploadDocument}
@@ -163,6 +204,8 @@ function App() {
           onToggleWebSearch={() => setEnableWebSearch(!enableWebSearch)}
           onToggleRag={() => setEnableRag(!enableRag)}
           currentThread={currentThread}
+          hasOlderMessages={hasOlderMessages}
+          onLoadOlderMessages={() => currentThread && loadOlderMessages(currentThread.id)}
         />
       </main>
     </div>
@@ -12,14 +12,17 @@ export function ChatArea({
   enableRag,
   onToggleWebSearch,
   onToggleRag,
-  currentThread
+  currentThread,
+  hasOlderMessages,
+  onLoadOlderMessages
 }) {
   const messagesEndRef = useRef(null);
+  const lastMessage = messages[messages.length - 1];
 
-  // Auto-scroll to bottom
+  // Auto-scroll to bottom as messages arrive, but not when older ones are prepended
   useEffect(() => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
-  }, [messages]);
+  }, [lastMessage?.id, lastMessage?.content]);
 
   return (
     <div className="flex-1 flex flex-col h-full">
@@ -50,6 +53,16 @@ export function ChatArea({
           </div>
         ) : (
           <div className="space-y-6 max-w-4xl mx-auto">
+            {hasOlderMessages && (
+              <div className="flex justify-center">
+                <button
+                  onClick={onLoadOlderMessages}
+                  className="px-4 py-2 bg-dark-800 hover:bg-dark-700 rounded-lg text-sm text-dark-300 transition-colors"
+                >
+                  Load earlier messages
+                </button>
+              </div>
+            )}
             {messages.map((message) => (
               <ChatMessage key={message.id} message={message} />
             ))}
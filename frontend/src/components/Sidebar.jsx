@@ -19,6 +19,8 @@ export function Sidebar({
   documents, 
   currentThread, 
   onSelectThread, 
+  hasMoreThreads,
+  onLoadMoreThreads,
   onNewThread, 
   onDeleteThread,
   onUploadDocument,
@@ -131,6 +133,14 @@ export function Sidebar({
                 </button>
               </div>
             ))}
+            {hasMoreThreads && (
+              <button
+                onClick={onLoadMoreThreads}
+                className="w-full p-2 text-sm text-dark-400 hover:text-dark-200 hover:bg-dark-800 rounded-lg transition-colors"
+              >
+                Load more
+              </button>
+            )}
           </div>
         </div>
 
@@ -177,7 +187,13 @@ export function Sidebar({
                   {getFileIcon(doc.file_type)}
                   <div className="flex-1 min-w-0">
                     <p className="text-sm truncate">{doc.filename}</p>
-                    <p className="text-xs text-dark-400">{doc.chunk_count} chunks</p>
+                    <p className="text-xs text-dark-400">
+                      {doc.status === 'failed'
+                        ? 'Processing failed'
+                        : doc.processed
+                          ? `${doc.chunk_count} chunks`
+                          : `Processing... ${doc.chunk_count} chunks`}
+                    </p>
                   </div>
                   <button
                     onClick={() => onDeleteDocument(doc.id)}
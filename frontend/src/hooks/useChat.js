@@ -6,16 +6,29 @@ export function useChat() {
   const [isLoading, setIsLoading] = useState(false);
   const [status, setStatus] = useState(null);
   const [sources, setSources] = useState([]);
+  const [olderCursor, setOlderCursor] = useState(null);
 
   const loadMessages = useCallback(async (threadId) => {
     try {
-      const msgs = await api.getMessages(threadId);
-      setMessages(msgs);
+      const { items, nextCursor } = await api.getMessages(threadId);
+      setMessages(items);
+      setOlderCursor(nextCursor);
     } catch (error) {
       console.error('Error loading messages:', error);
     }
   }, []);
 
+  const loadOlderMessages = useCallback(async (threadId) => {
+    if (!olderCursor) return;
+    try {
+      const { items, nextCursor } = await api.getMessages(threadId, olderCursor);
+      setMessages(prev => [...items, ...prev]);
+      setOlderCursor(nextCursor);
+    } catch (error) {
+      console.error('Error loading older messages:', error);
+    }
+  }, [olderCursor]);
+
   const sendMessage = useCallback(async (message, threadId, enableWebSearch, enableRag) => {
     setIsLoading(true);
     setStatus('thinking');
@@ -63,6 +76,11 @@ export function useChat() {
               ? { ...msg, isStreaming: false, sources: JSON.stringify(sources) }
               : msg
           ));
+          setIsLoading(false);
+          setStatus(null);
+        }
+        if (data.thread_title) {
+          // Sent with done, and again if the generated title arrives later
           threadTitle = data.thread_title;
         }
         if (data.error) {
@@ -87,6 +105,7 @@ export function useChat() {
   const clearMessages = useCallback(() => {
     setMessages([]);
     setSources([]);
+    setOlderCursor(null);
   }, []);
 
   return {
@@ -96,6 +115,8 @@ export function useChat() {
     sources,
     sendMessage,
     loadMessages,
+    loadOlderMessages,
+    hasOlderMessages: olderCursor !== null,
     clearMessages
   };
 }
\ No newline at end of file
@@ -1,11 +1,21 @@
 const API_BASE = '/api';
 
+// List endpoints return one page; the cursor for the next one is in this header
+const NEXT_CURSOR_HEADER = 'X-Next-Cursor';
+
+async function getPage(url, cursor, errorMessage) {
+  const response = await fetch(cursor ? `${url}?cursor=${encodeURIComponent(cursor)}` : url);
+  if (!response.ok) throw new Error(errorMessage);
+  return {
+    items: await response.json(),
+    nextCursor: response.headers.get(NEXT_CURSOR_HEADER)
+  };
+}
+
 export const api = {
-  // Threads
-  async getThreads() {
-    const response = await fetch(`${API_BASE}/threads/`);
-    if (!response.ok) throw new Error('Failed to fetch threads');
-    return response.json();
+  // Threads, most recently updated first
+  async getThreads(cursor = null) {
+    return getPage(`${API_BASE}/threads/`, cursor, 'Failed to fetch threads');
   },
 
   async createThread(title = 'New Conversation') {
@@ -26,10 +36,9 @@ export const api = {
     return response.json();
   },
 
-  async getMessages(threadId) {
-    const response = await fetch(`${API_BASE}/threads/${threadId}/messages`);
-    if (!response.ok) throw new Error('Failed to fetch messages');
-    return response.json();
+  // Latest messages in chronological order; the cursor pages back to older ones
+  async getMessages(threadId, cursor = null) {
+    return getPage(`${API_BASE}/threads/${threadId}/messages`, cursor, 'Failed to fetch messages');
   },
 
   // Chat (streaming)
@@ -90,6 +99,12 @@ export const api = {
     return response.json();
   },
 
+  async getDocumentStatus(documentId) {
+    const response = await fetch(`${API_BASE}/documents/${documentId}/status`);
+    if (!response.ok) throw new Error('Failed to fetch document status');
+    return response.json();
+  },
+
   async deleteDocument(documentId) {
     const response = await fetch(`${API_BASE}/documents/${documentId}`, {
       method: 'DELETE'